@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
@@ -13,11 +13,69 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str = "sqlite+aiosqlite:///./chatbot.db"
+    database_read_url: str = ""  # read replica for list/get endpoints (empty = primary)
+    database_echo: bool = False  # log every SQL statement
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30.0  # seconds to wait for a free connection
+    database_pool_recycle: int = 1800  # seconds; -1 never recycles
+    database_pool_pre_ping: bool = True
+    sqlite_journal_mode: str = "WAL"  # empty keeps SQLite's default
+    sqlite_synchronous: str = "NORMAL"  # safe with WAL, far fewer fsyncs than FULL
+    sqlite_busy_timeout_ms: int = 5000  # wait on a locked database instead of failing
 
     # Security
     secret_key: str = "your-secret-key-here-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    principal_cache_size: int = 10000  # cached authenticated users (0 disables)
+    principal_cache_ttl: int = 60  # seconds; never outlives the token's exp
+    password_hash_workers: int = 2  # bcrypt threads
+    password_hash_max_pending: int = 32  # running + queued before fast 503
+    password_hash_retry_after: int = 1  # seconds, sent with the 503
+
+    # Message storage
+    message_preview_chars: int = 200  # preview length in summary listings
+    message_compress_threshold: int = 8192  # compress content this long (0 disables)
+    message_compress_level: int = 6  # zlib level 1-9
+
+    # Full-text search (SQLite FTS5 / PostgreSQL tsvector)
+    search_enabled: bool = True
+    search_sqlite_tokenizer: str = "unicode61 remove_diacritics 2"  # "trigram" for substring/CJK
+    search_postgres_config: str = "simple"  # text search configuration, e.g. "english"
+    search_snippet_tokens: int = 16
+    search_limit_max: int = 100
+
+    # Retrieval over text/PDF attachments (PDFs need the optional "pypdf" package)
+    retrieval_enabled: bool = True
+    retrieval_embedder: str = "hashing"  # "hashing" (local, offline) or "openai"
+    retrieval_embedding_model: str = "text-embedding-3-small"  # for "openai"
+    retrieval_hashing_dim: int = 512
+    retrieval_chunk_chars: int = 1000
+    retrieval_chunk_overlap: int = 200  # keep well under half of retrieval_chunk_chars
+    retrieval_top_k: int = 4
+    retrieval_min_score: float = 0.05  # cosine similarity
+    retrieval_ivf_min_rows: int = 4096  # files with more chunks get an IVF index
+    retrieval_ivf_nprobe: int = 8
+    retrieval_ingest_wait_seconds: float = 2.0  # generation skips attachments not indexed by then
+
+    # Automatic chat titles, generated in the background after the first reply
+    title_enabled: bool = True
+    title_model: str = ""  # one model for all titles; empty = per provider, below
+    # Small model per provider of the chat's model; providers not listed use the chat's model
+    title_models: Dict[str, str] = {"openai": "gpt-4o-mini", "gemini": "gemini-1.5-flash-8b"}
+    title_workers: int = 2
+    title_batch_size: int = 8  # chats titled per completion
+    title_batch_window_ms: int = 200  # wait this long to fill a batch
+    title_queue_size: int = 1000
+    title_max_chars: int = 60
+
+    # Pagination (chat and message listings)
+    page_size_default: int = 50  # used when only a cursor is sent; no limit/cursor = full list
+    page_size_max: int = 500
+
+    # Delta sync change log
+    sync_retention_days: int = 30  # 0 keeps changes forever
 
     # CORS
     cors_origins: List[str] = [
@@ -31,6 +89,7 @@ class Settings(BaseSettings):
 
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama2"
+    ollama_endpoints: List[str] = []  # several Ollama hosts; defaults to [ollama_base_url]
 
     # Gemini Configuration (OpenAI-compatible endpoint)
     gemini_api_key: str = ""
@@ -38,19 +97,83 @@ class Settings(BaseSettings):
     gemini_base_url: str = "https://generativelanguage.googleapis.com/v1beta/openai/"
 
     default_ai_provider: str = "openai"  # "openai", "ollama", or "gemini"
+    max_fan_out: int = 4  # models one generate request may answer with
+
+    # Metrics (Prometheus text format on /metrics)
+    metrics_enabled: bool = True
+
+    # Model routing: model name or fnmatch pattern -> provider
+    model_routes: Dict[str, str] = {}  # e.g. {"gpt-oss*": "ollama"}
+    model_endpoints: Dict[str, List[str]] = {}  # Ollama hosts serving a given model
+    routing_ewma_alpha: float = 0.3  # weight of the newest TTFT sample
+    routing_eject_failures: int = 3  # consecutive failures before an endpoint is skipped...
+    routing_eject_seconds: int = 30  # ...for this long, then probed again
+
+    # Provider resilience: hedging, failover and circuit breaking
+    resilience_enabled: bool = False
+    provider_fallbacks: Dict[str, str] = {}  # e.g. {"ollama": "openai:gpt-3.5-turbo"}
+    hedge_enabled: bool = True
+    hedge_delay_ms: int = 2000  # send a hedged request if no first token by then
+    circuit_failure_threshold: int = 5  # consecutive failures before opening
+    circuit_reset_seconds: float = 30.0  # open time before a trial request
+
+    # Provider connection pools (shared process-wide, see services/providers.py)
+    provider_timeout: float = 60.0
+    provider_connect_timeout: float = 10.0
+    provider_keepalive_expiry: float = 60.0
+    provider_http2: bool = False  # requires the optional "h2" package
+    provider_warmup: bool = True
+    openai_max_connections: int = 100
+    openai_max_keepalive: int = 20
+    gemini_max_connections: int = 100
+    gemini_max_keepalive: int = 20
+    ollama_max_connections: int = 32
+    ollama_max_keepalive: int = 16
+
+    # Conversation context window
+    context_max_tokens: int = 8192
+    context_reserve_tokens: int = 1024  # left free for the response
+    context_summary_enabled: bool = False
+    context_summary_model: str = ""  # empty = same model as the chat
+
+    # Streaming persistence
+    stream_checkpoint_tokens: int = 64  # checkpoint every N chunks...
+    stream_checkpoint_interval_ms: int = 1000  # ...or every T milliseconds
+    stream_orphan_grace_seconds: int = 120  # STREAMING rows older than this are repaired
+    stream_orphan_sweep_seconds: int = 60  # how often the repair runs after startup
+    stream_replay_buffer: int = 2048  # events kept per generation for reconnects
+    stream_linger_seconds: int = 60  # finished streams stay attachable this long
+
+    # Generation admission control (per provider, or per "provider:model" override)
+    scheduler_enabled: bool = True
+    scheduler_default_concurrency: int = 8
+    scheduler_concurrency: Dict[str, int] = {}  # e.g. {"ollama": 2, "openai:gpt-4": 4}
+    scheduler_max_queue: int = 100  # waiting generations per lane before 429
+    scheduler_max_queued_per_user: int = 5
+    scheduler_queue_timeout: float = 60.0  # seconds a generation may wait for a slot
+    scheduler_superuser_weight: float = 2.0  # fair-queueing weight (users have 1.0)
 
     # File Upload
     max_upload_size: int = 10485760  # 10MB
-    upload_dir: str = "./uploads"
+    upload_dir: str = "./uploads"  # blobs/ holds content-addressed files, tmp/ partial uploads
+    upload_chunk_size: int = 1048576  # bytes per disk read/write while streaming
 
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     enable_redis: bool = False
 
+    # Completion cache (exact match; Redis tier used when enable_redis is set)
+    completion_cache_enabled: bool = False
+    completion_cache_size: int = 1000
+    completion_cache_ttl: int = 3600  # seconds
+    completion_cache_max_chars: int = 100000  # larger completions are not cached
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
-        case_sensitive=False
+        case_sensitive=False,
+        # Allow model_* field names (model_routes, model_endpoints)
+        protected_namespaces=("settings_",)
     )
 
 
@@ -1,17 +1,68 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import get_settings
+from app.metrics import db_session_duration, instrument_engine
 
 settings = get_settings()
 
-# Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent streaming writes"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    if settings.sqlite_journal_mode:
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    if settings.sqlite_synchronous:
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.close()
+
+
+def create_engine_for(database_url: str):
+    """Create an async engine with the configured pool and per-backend tuning"""
+    url = make_url(database_url)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    options = {
+        "echo": settings.database_echo,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+
+    # In-memory SQLite uses a single static connection; sizing does not apply
+    if not (is_sqlite and url.database in (None, "", ":memory:")):
+        if is_sqlite:
+            # aiosqlite defaults to NullPool (a new connection, and pragmas, per checkout)
+            options["poolclass"] = AsyncAdaptedQueuePool
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+        )
+
+    new_engine = create_async_engine(database_url, **options)
+
+    if is_sqlite:
+        event.listen(new_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    if settings.metrics_enabled:
+        instrument_engine(new_engine)
+
+    return new_engine
+
+
+# Primary (read/write) engine
+engine = create_engine_for(settings.database_url)
+
+# Read-only engine: a replica when DATABASE_READ_URL is set, else the primary
+read_engine = (
+    create_engine_for(settings.database_read_url)
+    if settings.database_read_url
+    else engine
 )
 
-# Create async session factory
+# Create async session factories
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -20,12 +71,21 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)
+
 # Base class for models
 Base = declarative_base()
 
 
 async def get_db():
     """Dependency for getting async database sessions"""
+    started = time.perf_counter()
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -35,9 +95,38 @@ async def get_db():
             raise
         finally:
             await session.close()
+            db_session_duration.observe(time.perf_counter() - started)
+
+
+async def get_read_db():
+    """Dependency for read-only sessions (list/get endpoints)
+
+    May point at a replica, so results can lag a just-committed write.
+    Nothing is committed; the transaction is always rolled back.
+    """
+    started = time.perf_counter()
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+            await session.close()
+            db_session_duration.observe(time.perf_counter() - started)
+
+
+async def dispose_engines():
+    """Close every pooled database connection"""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
 async def init_db():
     """Initialize database tables"""
+    # Imported here so every model is registered before create_all
+    import app.models  # noqa: F401
+    from app.migrations import run_migrations
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
@@ -1,11 +1,30 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import get_settings
-from app.database import init_db
-from app.routers import auth_router, chats_router, messages_router
+from app.database import dispose_engines, init_db
+from app.metrics import MetricsMiddleware, registry
+from app.routers import (
+    auth_router, chats_router, events_router, files_router, messages_router, search_router,
+    sync_router, ws_router
+)
+from app.services.auth import principal_cache
+from app.services.broker import stream_broker
+from app.services.completion_cache import completion_cache
+from app.services.events import user_events
+from app.services.files import FileService
+from app.services.providers import provider_clients
+from app.services.resilience import resilience_policy
+from app.services.routing import model_router
+from app.services.scheduler import generation_scheduler
+from app.services.streaming import recover_orphaned_streams, sweep_orphaned_streams
+from app.services.sync import prune_changes
+from app.services.titles import title_worker
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.security import password_hasher
 
 settings = get_settings()
 
@@ -17,11 +36,34 @@ async def lifespan(app: FastAPI):
     print("Starting up...")
     await init_db()
     print("Database initialized")
+    repaired = await recover_orphaned_streams()
+    if repaired:
+        print(f"Recovered {repaired} interrupted streaming message(s)")
+    pruned = await prune_changes()
+    if pruned:
+        print(f"Pruned {pruned} sync change(s)")
+    removed = FileService.clean_partial_uploads()
+    if removed:
+        print(f"Removed {removed} abandoned partial upload(s)")
+    await provider_clients.start()
+    print("Provider clients initialized")
+    await completion_cache.start()
+    title_worker.start()
+    orphan_sweeper = asyncio.create_task(sweep_orphaned_streams())
 
     yield
 
     # Shutdown
     print("Shutting down...")
+    orphan_sweeper.cancel()
+    with suppress(asyncio.CancelledError):
+        await orphan_sweeper
+    await stream_broker.shutdown()
+    await title_worker.stop()
+    await provider_clients.close()
+    await completion_cache.close()
+    password_hasher.shutdown()
+    await dispose_engines()
 
 
 # Create FastAPI app
@@ -40,12 +82,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Content-Range", "ETag"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth_router, prefix=settings.api_v1_prefix)
 app.include_router(chats_router, prefix=settings.api_v1_prefix)
 app.include_router(messages_router, prefix=settings.api_v1_prefix)
+app.include_router(sync_router, prefix=settings.api_v1_prefix)
+app.include_router(search_router, prefix=settings.api_v1_prefix)
+app.include_router(files_router, prefix=settings.api_v1_prefix)
+app.include_router(events_router, prefix=settings.api_v1_prefix)
+app.include_router(ws_router, prefix=settings.api_v1_prefix)
 
 
 @app.get("/")
@@ -61,7 +112,27 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "completion_cache": completion_cache.stats(),
+        "scheduler": generation_scheduler.stats(),
+        "resilience": resilience_policy.stats(),
+        "routing": model_router.stats(),
+        "titles": title_worker.stats(),
+        "events": user_events.stats()
+    }
+
+
+if settings.metrics_enabled:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics endpoint"""
+        return PlainTextResponse(
+            registry.render(),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
 
 
 # Exception handlers
@@ -0,0 +1,137 @@
+"""Application metrics, exposed in the Prometheus text format on /metrics"""
+import time
+
+from sqlalchemy import event
+
+from app.utils.metrics import MetricsRegistry
+
+registry = MetricsRegistry()
+
+# Generation (measured inside AIService)
+generation_ttft = registry.histogram(
+    "chatbot_generation_ttft_seconds",
+    "Time from provider request to first streamed token",
+    ("provider", "model")
+)
+generation_duration = registry.histogram(
+    "chatbot_generation_duration_seconds",
+    "Duration of a provider stream",
+    ("provider", "model")
+)
+generation_tokens_per_second = registry.histogram(
+    "chatbot_generation_tokens_per_second",
+    "Streamed chunks per second after the first token",
+    ("provider", "model"),
+    buckets=(1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400)
+)
+generation_tokens = registry.counter(
+    "chatbot_generation_tokens_total",
+    "Streamed chunks (approximately tokens)",
+    ("provider", "model")
+)
+generations = registry.counter(
+    "chatbot_generations_total",
+    "Provider streams by outcome",
+    ("provider", "model", "outcome")
+)
+
+# Streaming
+sse_streams_active = registry.gauge(
+    "chatbot_sse_streams_active",
+    "Open SSE subscriber connections"
+)
+ws_connections_active = registry.gauge(
+    "chatbot_ws_connections_active",
+    "Open WebSocket connections"
+)
+
+# Retrieval over attachments
+retrieval_duration = registry.histogram(
+    "chatbot_retrieval_seconds",
+    "Query embedding and vector search time per generation",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+# Database
+db_session_duration = registry.histogram(
+    "chatbot_db_session_seconds",
+    "Lifetime of a request-scoped database session"
+)
+db_query_duration = registry.histogram(
+    "chatbot_db_query_seconds",
+    "Database statement execution time",
+    ("statement",)
+)
+
+# HTTP
+http_request_duration = registry.histogram(
+    "chatbot_http_request_duration_seconds",
+    "Time until the response starts, per route",
+    ("method", "route", "status")
+)
+
+
+def instrument_engine(engine):
+    """Time every statement executed through engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.observe(time.perf_counter() - started, statement=verb)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None:
+            stack = context.connection.info.get("query_start")
+            if stack:
+                stack.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request latency
+
+    Latency is measured until the response starts, so long-lived SSE
+    responses count their time to first byte rather than their lifetime.
+    Routes are labelled by path template to keep cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status_code):
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code)
+            )
+
+        async def send_wrapper(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not recorded:
+                record(500)
+            raise
@@ -0,0 +1,180 @@
+import json
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from app.database import Base
+
+# Rows rewritten per statement by data backfills
+BATCH_SIZE = 500
+
+# (table, index) pairs replaced by other indexes
+RETIRED_INDEXES = [
+    ("chats", "ix_chats_user_updated"),
+    ("changes", "ix_changes_user_seq"),
+    ("messages", "ix_messages_chat_id"),  # leading column of ix_messages_chat_timestamp
+]
+
+
+def _add_missing_columns(conn: Connection):
+    """Add nullable columns declared on models but missing from existing tables"""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _create_missing_indexes(conn: Connection):
+    """Create indexes declared on models but missing from existing tables"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _drop_retired_indexes(conn: Connection):
+    """Drop indexes that models no longer declare (and no query uses)"""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+
+    for table_name, index_name in RETIRED_INDEXES:
+        if table_name not in existing_tables:
+            continue
+        if any(index["name"] == index_name for index in inspector.get_indexes(table_name)):
+            on_table = f" ON {table_name}" if conn.dialect.name == "mysql" else ""
+            conn.execute(text(f"DROP INDEX {index_name}{on_table}"))
+
+
+def _backfill_chat_updated_at(conn: Connection):
+    """Give chats that were never updated a sortable updated_at"""
+    conn.execute(text("UPDATE chats SET updated_at = created_at WHERE updated_at IS NULL"))
+
+
+def _move_children_ids_to_parent_id(conn: Connection):
+    """Fold legacy children_ids arrays into the children's parent_id
+
+    Replies are now derived from the indexed parent_id column; the arrays
+    are emptied once folded so this only does work the first time.
+    """
+    rows = conn.execute(text(
+        "SELECT id, children_ids FROM messages "
+        "WHERE children_ids IS NOT NULL AND CAST(children_ids AS TEXT) != '[]'"
+    )).all()
+
+    adopt = text(
+        "UPDATE messages SET parent_id = :parent_id "
+        "WHERE id IN :child_ids AND parent_id IS NULL"
+    ).bindparams(bindparam("child_ids", expanding=True))
+
+    for message_id, children_ids in rows:
+        if isinstance(children_ids, str):
+            children_ids = json.loads(children_ids)
+        if children_ids:
+            conn.execute(adopt, {"parent_id": message_id, "child_ids": list(children_ids)})
+        conn.execute(
+            text("UPDATE messages SET children_ids = '[]' WHERE id = :id"),
+            {"id": message_id}
+        )
+
+
+def _backfill_message_previews(conn: Connection):
+    """Fill preview/content_length and compress large content of older rows"""
+    from app.models.message import Message
+
+    messages = Message.__table__
+    rewrite = (
+        messages.update()
+        .where(messages.c.id == bindparam("message_id"))
+        .values(
+            content=bindparam("new_content"),
+            preview=bindparam("new_preview"),
+            content_length=bindparam("new_content_length")
+        )
+    )
+
+    while True:
+        rows = conn.execute(
+            select(messages.c.id, messages.c.content)
+            .where(messages.c.preview.is_(None))
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+
+        conn.execute(rewrite, [
+            {
+                "message_id": row.id,
+                **{f"new_{key}": value for key, value in Message.content_fields(row.content).items()}
+            }
+            for row in rows
+        ])
+
+
+def _backfill_chat_summaries(conn: Connection):
+    """Compute sidebar summaries for chats created before they were maintained"""
+    conn.execute(text(
+        "UPDATE chats SET "
+        "message_count = (SELECT COUNT(*) FROM messages WHERE messages.chat_id = chats.id), "
+        "last_activity_at = COALESCE("
+        "(SELECT MAX(timestamp) FROM messages WHERE messages.chat_id = chats.id), "
+        "updated_at, created_at), "
+        "last_message_preview = ("
+        "SELECT preview FROM messages WHERE messages.chat_id = chats.id "
+        "ORDER BY timestamp DESC, id DESC LIMIT 1) "
+        "WHERE last_activity_at IS NULL OR message_count IS NULL"
+    ))
+
+
+def _backfill_sync_cursors(conn: Connection):
+    """Move the change log from the global seq to per-user counters
+
+    Old cursors were global seq values, so existing rows keep seq as
+    user_seq and every counter starts at the global maximum. Without
+    knowing what was pruned, pruned_seq is set conservatively (a client
+    may be asked to reset, but never skips a change).
+    """
+    conn.execute(text("UPDATE changes SET user_seq = seq WHERE user_seq IS NULL"))
+    conn.execute(text(
+        "INSERT INTO sync_counters (user_id, seq, pruned_seq) "
+        "SELECT users.id, "
+        "(SELECT COALESCE(MAX(seq), 0) FROM changes), "
+        "COALESCE("
+        "(SELECT MIN(seq) - 1 FROM changes WHERE changes.user_id = users.id), "
+        "(SELECT COALESCE(MAX(seq), 0) FROM changes)) "
+        "FROM users "
+        "WHERE NOT EXISTS (SELECT 1 FROM sync_counters WHERE sync_counters.user_id = users.id)"
+    ))
+
+
+def _create_search_index(conn: Connection):
+    """Create the full-text index (FTS5 / tsvector) and index messages missing from it"""
+    from app.services.search import backfill_search_index, create_search_index
+
+    create_search_index(conn)
+    backfill_search_index(conn, BATCH_SIZE)
+
+
+# Idempotent schema/data steps applied in order after create_all
+MIGRATIONS = [
+    _add_missing_columns,
+    _create_missing_indexes,
+    _drop_retired_indexes,
+    _backfill_chat_updated_at,
+    _move_children_ids_to_parent_id,
+    _backfill_message_previews,
+    _backfill_chat_summaries,
+    _backfill_sync_cursors,
+    _create_search_index,
+]
+
+
+def run_migrations(conn: Connection):
+    """Bring an existing database up to the current models"""
+    for migration in MIGRATIONS:
+        migration(conn)
@@ -1,5 +1,7 @@
 from app.models.user import User
 from app.models.chat import Chat
 from app.models.message import Message
+from app.models.change import Change, SyncCounter
+from app.models.file import File, FileChunk
 
-__all__ = ["User", "Chat", "Message"]
+__all__ = ["User", "Chat", "Message", "Change", "SyncCounter", "File", "FileChunk"]
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, DateTime, Integer, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Change(Base):
+    """Append-only log of chat/message writes, read by the sync endpoint"""
+    __tablename__ = "changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    user_seq = Column(Integer, nullable=True)  # sync cursor, in commit order per user
+    user_id = Column(String, nullable=False)
+    chat_id = Column(String, nullable=True)
+    entity = Column(String, nullable=False)  # "chat" or "message"
+    entity_id = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # "upsert" or "delete"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_changes_user_cursor", "user_id", "user_seq"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class SyncCounter(Base):
+    """Per-user change counter
+
+    Numbering a transaction's changes updates (and so locks) this row
+    until commit, which makes user_seq follow commit order even when
+    several writers run at once.
+    """
+    __tablename__ = "sync_counters"
+
+    user_id = Column(String, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)  # last user_seq handed out
+    pruned_seq = Column(Integer, nullable=False, default=0)  # highest user_seq pruned from the log
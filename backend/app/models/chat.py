@@ -1,19 +1,50 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
+from typing import Optional
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON, Index, update
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from app.config import get_settings
 from app.database import Base
 
+settings = get_settings()
+
+# Title of new chats until the user (or the title worker) renames them
+DEFAULT_CHAT_TITLE = "새 대화"
+
 
 class Chat(Base):
     __tablename__ = "chats"
 
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    title = Column(String, nullable=False, default="새 대화")
+    title = Column(String, nullable=False, default=DEFAULT_CHAT_TITLE)
     selected_models = Column(JSON, nullable=False, default=list)  # Array of model names
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Sidebar summary, maintained in the same transaction as message writes
+    last_message_preview = Column(String, nullable=True)
+    message_count = Column(Integer, nullable=True, default=0, server_default="0")
+    last_activity_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="chats")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Sidebar ordering (and keyset pagination) by last activity
+        Index("ix_chats_user_activity", "user_id", "last_activity_at", "id"),
+    )
+
+    @staticmethod
+    def record_activity(chat_id: str, preview: Optional[str] = None, added: int = 0):
+        """UPDATE statement bumping a chat's summary after message writes
+
+        The count is incremented server-side, so concurrent writers never
+        lose each other's increments.
+        """
+        values = {"last_activity_at": func.now()}
+        if added:
+            values["message_count"] = func.coalesce(Chat.message_count, 0) + added
+        if preview is not None:
+            values["last_message_preview"] = preview[:settings.message_preview_chars]
+        return update(Chat).where(Chat.id == chat_id).values(**values)
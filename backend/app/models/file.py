@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Index, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class File(Base):
+    """An uploaded attachment; the bytes live in a content-addressed blob
+
+    Several rows (uploads by different users, or under different names)
+    may share one blob on disk through the same sha256.
+    """
+    __tablename__ = "files"
+
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    content_type = Column(String, nullable=False, default="application/octet-stream")
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_files_user_sha256", "user_id", "sha256"),
+    )
+
+
+class FileChunk(Base):
+    """A passage of an ingested text/PDF blob, shared by every File with that sha256
+
+    Embeddings live on disk (see services/vector_index.py), row-aligned
+    with ordinal.
+    """
+    __tablename__ = "file_chunks"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), nullable=False)
+    ordinal = Column(Integer, nullable=False)
+    page = Column(Integer, nullable=True)  # 1-based PDF page
+    text = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_file_chunks_sha256_ordinal", "sha256", "ordinal", unique=True),
+    )
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON, Enum, Index, text
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from app.config import get_settings
 from app.database import Base
+from app.models.types import CompressedText
 import enum
 
+settings = get_settings()
+
 
 class MessageRole(str, enum.Enum):
     USER = "user"
@@ -22,11 +26,17 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(String, primary_key=True, index=True)
-    chat_id = Column(String, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False, index=True)
+    chat_id = Column(String, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
     parent_id = Column(String, nullable=True)
-    children_ids = Column(JSON, nullable=False, default=list)
+    # Legacy JSON copy of the reply ids, always empty now: replies are
+    # derived from parent_id (ConversationService.load_children)
+    legacy_children_ids = Column(
+        "children_ids", JSON, nullable=False, default=list, server_default=text("'[]'")
+    )
     role = Column(Enum(MessageRole), nullable=False)
-    content = Column(String, nullable=False)
+    content = Column(CompressedText, nullable=False)  # zlib-compressed when large
+    preview = Column(String, nullable=True)  # leading characters, for list views
+    content_length = Column(Integer, nullable=True)
     model = Column(String, nullable=True)
     files = Column(JSON, nullable=True)  # Array of file metadata
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
@@ -37,3 +47,35 @@ class Message(Base):
 
     # Relationships
     chat = relationship("Chat", back_populates="messages")
+
+    __table_args__ = (
+        # Keyset pagination of a chat's messages in time order
+        Index("ix_messages_chat_timestamp", "chat_id", "timestamp", "id"),
+        # Replies of a message in time order
+        Index("ix_messages_parent_timestamp", "parent_id", "timestamp", "id"),
+    )
+
+    @staticmethod
+    def content_fields(content: str) -> dict:
+        """Column values derived from content (for Core UPDATEs that bypass validates)"""
+        return {
+            "content": content,
+            "preview": content[:settings.message_preview_chars],
+            "content_length": len(content),
+        }
+
+    @validates("content")
+    def _update_preview(self, key, content):
+        if content is not None:
+            self.preview = content[:settings.message_preview_chars]
+            self.content_length = len(content)
+        return content
+
+    @property
+    def children_ids(self) -> list[str]:
+        """Reply ids, filled in by ConversationService.load_children"""
+        return self.__dict__.get("_children_ids", [])
+
+    @children_ids.setter
+    def children_ids(self, value: list[str]):
+        self.__dict__["_children_ids"] = list(value)
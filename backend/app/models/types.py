@@ -0,0 +1,53 @@
+import base64
+import zlib
+from sqlalchemy import String
+from sqlalchemy.types import TypeDecorator
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Stored values starting with ESCAPE are encoded: ESCAPE + "z" is zlib data
+# (base64), ESCAPE + ESCAPE is a plain value that itself began with ESCAPE
+ESCAPE = "\x1b"
+COMPRESSED = ESCAPE + "z"
+
+
+def compress_text(value: str) -> str:
+    """Encode a value for storage, compressing it above the size threshold"""
+    threshold = settings.message_compress_threshold
+    if threshold > 0 and len(value) >= threshold:
+        packed = zlib.compress(value.encode("utf-8"), settings.message_compress_level)
+        encoded = COMPRESSED + base64.b64encode(packed).decode("ascii")
+        if len(encoded) < len(value):
+            return encoded
+    if value.startswith(ESCAPE):
+        return ESCAPE + value
+    return value
+
+
+def decompress_text(value: str) -> str:
+    """Decode a value produced by compress_text"""
+    if not value.startswith(ESCAPE):
+        return value
+    if value.startswith(COMPRESSED):
+        return zlib.decompress(base64.b64decode(value[len(COMPRESSED):])).decode("utf-8")
+    return value[1:]
+
+
+class CompressedText(TypeDecorator):
+    """Text column that transparently zlib-compresses large values
+
+    Values of MESSAGE_COMPRESS_THRESHOLD characters or more are stored
+    compressed (base64, so the column stays a portable text type).
+    Smaller values are stored as-is, so existing rows need no rewrite.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decompress_text(value)
@@ -1,5 +1,13 @@
 from app.routers.auth import router as auth_router
 from app.routers.chats import router as chats_router
 from app.routers.messages import router as messages_router
+from app.routers.events import router as events_router
+from app.routers.files import router as files_router
+from app.routers.search import router as search_router
+from app.routers.sync import router as sync_router
+from app.routers.ws import router as ws_router
 
-__all__ = ["auth_router", "chats_router", "messages_router"]
+__all__ = [
+    "auth_router", "chats_router", "messages_router", "events_router", "files_router",
+    "search_router", "sync_router", "ws_router"
+]
@@ -34,7 +34,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = await AuthService.get_user_by_id(db, user_id)
+    user = await AuthService.get_principal(db, user_id, payload.get("exp"))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
-from typing import List
+from typing import List, Optional
 from uuid import uuid4
 
-from app.database import get_db
+from app.config import get_settings
+from app.database import get_db, get_read_db
 from app.models.chat import Chat as ChatModel
 from app.models.user import User
 from app.schemas.chat import Chat, ChatCreate, ChatUpdate
 from app.routers.auth import get_current_user
+from app.services.search import SearchService
+from app.services.sync import SyncService, CHAT, DELETE
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_after, page_limit
+
+settings = get_settings()
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
@@ -28,6 +34,7 @@ async def create_chat(
     )
 
     db.add(chat)
+    SyncService.record(db, current_user.id, CHAT, chat.id, chat_id=chat.id)
     await db.commit()
     await db.refresh(chat)
 
@@ -36,17 +43,40 @@ async def create_chat(
 
 @router.get("", response_model=List[Chat])
 async def get_chats(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all chats for current user"""
+    """Get chats for current user, most recently active first
+
+    Each chat carries its sidebar summary (last message preview, message
+    count, last activity), so the whole sidebar is one indexed query.
+    Paginated by keyset when limit or cursor is given; the cursor for the
+    next page is returned in the X-Next-Cursor header.
+    """
+    limit = page_limit(limit, cursor)
+    scope = ChatModel.user_id == current_user.id
+    query = select(ChatModel).where(scope)
+    if cursor:
+        query = query.where(
+            keyset_after(ChatModel, ChatModel.last_activity_at, cursor, scope, descending=True)
+        )
+    if limit is not None:
+        query = query.limit(limit + 1)
+
     result = await db.execute(
-        select(ChatModel)
-        .where(ChatModel.user_id == current_user.id)
-        .order_by(ChatModel.updated_at.desc())
+        query.order_by(ChatModel.last_activity_at.desc(), ChatModel.id.desc())
     )
     chats = result.scalars().all()
 
+    if limit is not None and len(chats) > limit:
+        chats = chats[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            chats[-1].id, chats[-1].last_activity_at
+        )
+
     return chats
 
 
@@ -54,7 +84,7 @@ async def get_chats(
 async def get_chat(
     chat_id: str,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get a specific chat"""
     result = await db.execute(
@@ -100,6 +130,7 @@ async def update_chat(
     if chat_update.selected_models is not None:
         chat.selected_models = chat_update.selected_models
 
+    SyncService.record(db, current_user.id, CHAT, chat.id, chat_id=chat.id)
     await db.commit()
     await db.refresh(chat)
 
@@ -126,9 +157,11 @@ async def delete_chat(
             detail="Chat not found"
         )
 
+    await SearchService.remove_chat(db, chat_id)
     await db.execute(
         delete(ChatModel).where(ChatModel.id == chat_id)
     )
+    SyncService.record(db, current_user.id, CHAT, chat_id, DELETE, chat_id=chat_id)
     await db.commit()
 
     return None
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from typing import AsyncGenerator
+import asyncio
+
+from app.metrics import sse_streams_active
+from app.models.user import User
+from app.routers.auth import get_current_user
+from app.services.broker import format_sse
+from app.services.events import user_events
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+# Comment line sent when idle so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+async def _event_stream(user_id: str) -> AsyncGenerator[str, None]:
+    with user_events.subscription(user_id) as queue:
+        sse_streams_active.inc()
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(data)
+        finally:
+            sse_streams_active.dec()
+
+
+@router.get("", response_class=StreamingResponse)
+async def stream_events(current_user: User = Depends(get_current_user)):
+    """Server-sent notifications for the current user (e.g. generated chat titles)"""
+    return StreamingResponse(
+        _event_stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    )
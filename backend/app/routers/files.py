@@ -0,0 +1,173 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional
+from urllib.parse import quote
+from uuid import uuid4
+import mimetypes
+
+from app.config import get_settings
+from app.database import get_db, get_read_db
+from app.models.file import File as FileModel
+from app.models.user import User
+from app.schemas.file import FileInfo
+from app.routers.auth import get_current_user
+from app.services.files import FileService, FileTooLarge, RangeNotSatisfiable, parse_range
+from app.services.retrieval import RetrievalService
+
+settings = get_settings()
+
+router = APIRouter(prefix="/files", tags=["files"])
+
+# Types safe to render in the browser; everything else is downloaded.
+# Images are allow-listed raster formats: SVG can carry script.
+INLINE_TYPES = (
+    "image/png", "image/jpeg", "image/gif", "image/webp", "image/avif",
+    "audio/", "video/", "application/pdf", "text/plain"
+)
+
+
+def _file_info(file: FileModel) -> FileInfo:
+    return FileInfo(
+        id=file.id,
+        name=file.name,
+        type=file.content_type,
+        size=file.size,
+        url=f"{settings.api_v1_prefix}/files/{file.id}",
+        sha256=file.sha256,
+        created_at=file.created_at
+    )
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ is ignored, lists may omit spaces"""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == etag
+        for candidate in candidates
+    )
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {settings.max_upload_size} byte limit"
+    )
+
+
+@router.post("", response_model=FileInfo, status_code=status.HTTP_201_CREATED)
+async def upload_file(
+    request: Request,
+    name: str = Query(..., min_length=1, max_length=255),
+    content_type: Optional[str] = Header(None),
+    content_length: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Upload a file sent as the raw request body
+
+    The body is streamed to disk and hashed as it arrives; identical
+    content is stored once. Send the file's MIME type as Content-Type.
+    """
+    if content_type and content_type.startswith("multipart/"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the file as the raw request body, not as a form"
+        )
+    if content_length and content_length.isdigit() and int(content_length) > settings.max_upload_size:
+        raise _too_large()
+
+    try:
+        sha256, size = await FileService.store(request.stream(), settings.max_upload_size)
+    except FileTooLarge:
+        raise _too_large()
+
+    # Re-uploading the same file under the same name reuses its record
+    file = await db.scalar(
+        select(FileModel).where(
+            (FileModel.user_id == current_user.id)
+            & (FileModel.sha256 == sha256)
+            & (FileModel.name == name)
+        ).limit(1)
+    )
+    if file:
+        return _file_info(file)
+
+    file = FileModel(
+        id=str(uuid4()),
+        user_id=current_user.id,
+        name=name,
+        content_type=content_type or mimetypes.guess_type(name)[0] or "application/octet-stream",
+        size=size,
+        sha256=sha256
+    )
+    db.add(file)
+    await db.commit()
+    await db.refresh(file)
+
+    RetrievalService.schedule_ingest(file)
+
+    return _file_info(file)
+
+
+@router.get("/{file_id}")
+async def download_file(
+    file_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Download a file; supports single byte ranges and ETag revalidation"""
+    file = await db.scalar(
+        select(FileModel).where(
+            (FileModel.id == file_id) & (FileModel.user_id == current_user.id)
+        )
+    )
+    path = FileService.blob_path(file.sha256) if file else None
+
+    if not file or not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    # Content-addressed: the hash is a strong validator and never changes
+    etag = f'"{file.sha256}"'
+    disposition = "inline" if file.content_type.lower().startswith(INLINE_TYPES) else "attachment"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Content-Disposition": f"{disposition}; filename*=UTF-8''{quote(file.name)}",
+        "X-Content-Type-Options": "nosniff",
+        # Anything the browser does render runs without script or same-origin access
+        "Content-Security-Policy": "sandbox"
+    }
+
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, file.size)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{file.size}"}
+        )
+
+    start, end = byte_range or (0, file.size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{file.size}"
+
+    return StreamingResponse(
+        FileService.iter_range(path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type=file.content_type,
+        headers=headers
+    )
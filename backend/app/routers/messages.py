@@ -1,24 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from functools import partial
+import asyncio
+from typing import List, Optional
 from uuid import uuid4
-import json
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.message import Message as MessageModel, MessageStatus
-from app.models.chat import Chat as ChatModel
+from app.models.chat import Chat as ChatModel, DEFAULT_CHAT_TITLE
 from app.models.user import User
-from app.schemas.message import Message, MessageCreate, MessageUpdate
+from app.schemas.message import Message, MessageCreate, MessageFile, MessageSummary, MessageUpdate
 from app.routers.auth import get_current_user
 from app.services.ai import AIService
+from app.services.broker import (
+    GenerationStream, format_sse, merged_sse_events, sse_events, stream_broker
+)
+from app.services.context import CONTENT_DERIVED_METADATA, ContextManager
+from app.services.conversation import ConversationService
+from app.services.retrieval import RetrievalService
+from app.services.routing import model_router
+from app.services.scheduler import SchedulerBusy, Ticket, generation_scheduler
+from app.services.search import SearchService
+from app.services.streaming import StreamPersister
+from app.services.sync import SyncService, CHAT, MESSAGE
+from app.services.titles import TitleJob, title_worker
 from app.config import get_settings
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_after, page_limit
 
 settings = get_settings()
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+}
+
+
+def _files_json(files: Optional[List[MessageFile]]) -> Optional[list[dict]]:
+    """Attachment metadata as stored in the messages.files JSON column"""
+    return [file.model_dump() for file in files] if files else None
+
 
 @router.post("", response_model=Message, status_code=status.HTTP_201_CREATED)
 async def create_message(
@@ -46,25 +70,23 @@ async def create_message(
         id=str(uuid4()),
         chat_id=message_create.chat_id,
         parent_id=message_create.parent_id,
-        children_ids=[],
         role=message_create.role,
         content=message_create.content,
         model=message_create.model,
-        files=message_create.files,
+        files=_files_json(message_create.files),
         status=MessageStatus.COMPLETED
     )
 
     db.add(message)
 
-    # Update parent message's children
+    # The parent's children are derived from parent_id; only tell sync it changed
     if message_create.parent_id:
-        result = await db.execute(
-            select(MessageModel).where(MessageModel.id == message_create.parent_id)
-        )
-        parent = result.scalar_one_or_none()
-        if parent:
-            parent.children_ids = parent.children_ids + [message.id]
+        SyncService.record(db, current_user.id, MESSAGE, message_create.parent_id, chat_id=chat.id)
 
+    SyncService.record(db, current_user.id, MESSAGE, message.id, chat_id=chat.id)
+    await SearchService.index_message(db, message.id, message.content)
+    await db.execute(ChatModel.record_activity(chat.id, message.content, added=1))
+    SyncService.record(db, current_user.id, CHAT, chat.id, chat_id=chat.id)
     await db.commit()
     await db.refresh(message)
 
@@ -74,10 +96,18 @@ async def create_message(
 @router.get("/chat/{chat_id}", response_model=List[Message])
 async def get_messages_by_chat(
     chat_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all messages for a chat"""
+    """Get messages for a chat, oldest first
+
+    Paginated by keyset when limit or cursor is given; the cursor for the
+    next page is returned in the X-Next-Cursor header.
+    """
+    limit = page_limit(limit, cursor)
     # Verify chat belongs to user
     result = await db.execute(
         select(ChatModel).where(
@@ -93,16 +123,119 @@ async def get_messages_by_chat(
         )
 
     # Get messages
+    scope = MessageModel.chat_id == chat_id
+    query = select(MessageModel).where(scope)
+    if cursor:
+        query = query.where(keyset_after(MessageModel, MessageModel.timestamp, cursor, scope))
+    if limit is not None:
+        query = query.limit(limit + 1)
+
     result = await db.execute(
-        select(MessageModel)
-        .where(MessageModel.chat_id == chat_id)
-        .order_by(MessageModel.timestamp.asc())
+        query.order_by(MessageModel.timestamp.asc(), MessageModel.id.asc())
     )
     messages = result.scalars().all()
 
+    if limit is not None and len(messages) > limit:
+        messages = messages[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            messages[-1].id, messages[-1].timestamp
+        )
+
+    await ConversationService.load_children(db, messages)
     return messages
 
 
+@router.get("/chat/{chat_id}/summary", response_model=List[MessageSummary])
+async def get_message_summaries_by_chat(
+    chat_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get lightweight message summaries for a chat, oldest first
+
+    Only ids, tree links, status and a content preview are read; full
+    bodies are fetched per message from GET /messages/{message_id}.
+    Paginated like GET /messages/chat/{chat_id}.
+    """
+    limit = page_limit(limit, cursor)
+    # Verify chat belongs to user
+    result = await db.execute(
+        select(ChatModel.id).where(
+            (ChatModel.id == chat_id) & (ChatModel.user_id == current_user.id)
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat not found"
+        )
+
+    scope = MessageModel.chat_id == chat_id
+    query = select(
+        MessageModel.id,
+        MessageModel.chat_id,
+        MessageModel.parent_id,
+        MessageModel.role,
+        MessageModel.model,
+        MessageModel.status,
+        MessageModel.timestamp,
+        MessageModel.rating,
+        MessageModel.preview,
+        MessageModel.content_length
+    ).where(scope)
+    if cursor:
+        query = query.where(keyset_after(MessageModel, MessageModel.timestamp, cursor, scope))
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    result = await db.execute(
+        query.order_by(MessageModel.timestamp.asc(), MessageModel.id.asc())
+    )
+    rows = result.all()
+
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id, rows[-1].timestamp)
+
+    children = await ConversationService.children_of(db, [row.id for row in rows])
+    return [
+        {
+            **row._asdict(),
+            "preview": row.preview or "",
+            "content_length": row.content_length or 0,
+            "children_ids": children[row.id]
+        }
+        for row in rows
+    ]
+
+
+@router.get("/{message_id}", response_model=Message)
+async def get_message(
+    message_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get one message with its full content"""
+    result = await db.execute(
+        select(MessageModel)
+        .join(ChatModel, ChatModel.id == MessageModel.chat_id)
+        .where((MessageModel.id == message_id) & (ChatModel.user_id == current_user.id))
+    )
+    message = result.scalar_one_or_none()
+
+    if not message:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found"
+        )
+
+    await ConversationService.load_children(db, [message])
+    return message
+
+
 @router.patch("/{message_id}", response_model=Message)
 async def update_message(
     message_id: str,
@@ -139,25 +272,185 @@ async def update_message(
 
     # Update fields
     if message_update.content is not None:
+        if message_update.content != message.content and message.message_metadata:
+            # Cached token counts and a summary anchored here describe the old text
+            message.message_metadata = {
+                key: value for key, value in message.message_metadata.items()
+                if key not in CONTENT_DERIVED_METADATA
+            }
+        await SearchService.index_message(db, message.id, message_update.content)
         message.content = message_update.content
     if message_update.rating is not None:
         message.rating = message_update.rating
     if message_update.status is not None:
         message.status = message_update.status
 
+    SyncService.record(db, current_user.id, MESSAGE, message.id, chat_id=chat.id)
     await db.commit()
     await db.refresh(message)
+    await ConversationService.load_children(db, [message])
 
     return message
 
 
-@router.post("/generate", response_class=StreamingResponse)
-async def generate_message(
-    message_create: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
-    """Generate AI response for a message (streaming)"""
+def _resolve_models(chat: ChatModel, requested: List[str], fan_out: bool, default: Optional[str]):
+    """(providers, models) to answer with; several models fan out"""
+    models = requested or []
+    if not models and fan_out:
+        models = chat.selected_models or []
+    models = list(dict.fromkeys(models)) or [default]
+    if len(models) > settings.max_fan_out:
+        # The chat's selected_models (fan_out) are not bounded by the request schema
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.max_fan_out} models per request"
+        )
+
+    # Provider per model from the routing registry (default model when unset)
+    providers, models = zip(*(model_router.resolve(model) for model in models))
+    return providers, models
+
+
+def _admit(current_user: User, providers, models) -> list[Optional[Ticket]]:
+    """Admission control: reserve queue places before anything is written
+
+    Rejects fast when queues are full. The caller must release the
+    tickets if it fails before handing them to the generations.
+    """
+    if not settings.scheduler_enabled:
+        return [None] * len(models)
+    weight = settings.scheduler_superuser_weight if current_user.is_superuser else 1.0
+    try:
+        return generation_scheduler.admit(zip(providers, models), current_user.id, weight)
+    except SchedulerBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many pending generations, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def _is_repeated_prompt(
+    db: AsyncSession,
+    chat_id: str,
+    parent_id: Optional[str],
+    content: str
+) -> bool:
+    """Whether the same user prompt already exists at this point of the tree"""
+    result = await db.execute(
+        select(MessageModel.content).where(
+            (MessageModel.chat_id == chat_id)
+            & (MessageModel.parent_id == parent_id if parent_id else MessageModel.parent_id.is_(None))
+            & (MessageModel.role == "user")
+        )
+    )
+    return content in result.scalars().all()
+
+
+async def _has_titled_reply(db: AsyncSession, chat_id: str) -> bool:
+    """Whether any reply in the chat completed (not cancelled), i.e. titling already ran"""
+    result = await db.execute(
+        select(MessageModel.message_metadata).where(
+            (MessageModel.chat_id == chat_id)
+            & (MessageModel.role == "assistant")
+            & (MessageModel.status == MessageStatus.COMPLETED)
+        )
+    )
+    return any(not (metadata or {}).get("cancelled") for metadata in result.scalars())
+
+
+async def _start_replies(
+    db: AsyncSession,
+    current_user: User,
+    chat: ChatModel,
+    user_message: MessageModel,
+    providers,
+    models,
+    tickets: list[Optional[Ticket]],
+    needs_title: bool = False,
+    use_cache: bool = True
+) -> tuple[list[MessageModel], list[GenerationStream]]:
+    """Create assistant placeholders under user_message and start generating them"""
+    # Create AI message placeholders, one per model (fan-out when several)
+    ai_messages = [
+        MessageModel(
+            id=str(uuid4()),
+            chat_id=chat.id,
+            parent_id=user_message.id,
+            role="assistant",
+            content="",
+            model=model,
+            status=MessageStatus.STREAMING
+        )
+        for model in models
+    ]
+
+    db.add_all(ai_messages)
+
+    SyncService.record(db, current_user.id, MESSAGE, user_message.id, chat_id=chat.id)
+    for ai_message in ai_messages:
+        SyncService.record(db, current_user.id, MESSAGE, ai_message.id, chat_id=chat.id)
+    await db.execute(ChatModel.record_activity(chat.id, added=len(ai_messages)))
+    SyncService.record(db, current_user.id, CHAT, chat.id, chat_id=chat.id)
+    await db.commit()
+
+    # Get conversation history along the branch ending at the user message
+    history = await ConversationService.get_ancestor_path(
+        db, chat.id, user_message.id
+    )
+
+    # Excerpts from files attached on this branch, cited by every reply
+    citations = await RetrievalService.retrieve(
+        db, current_user.id, [message["id"] for message in history], user_message.content
+    )
+    for ai_message in ai_messages:
+        ai_message.citations = citations or None
+    excerpts = RetrievalService.context_message(citations)
+
+    # Fit history into each model's token budget
+    conversations = [
+        await ContextManager(
+            ai_message.model, provider=provider, user_id=current_user.id
+        ).build(db, history, excerpts)
+        for ai_message, provider in zip(ai_messages, providers)
+    ]
+    await db.commit()
+
+    # Start all generations at once, each with its reserved queue place
+    streams = [
+        stream_broker.start(
+            ai_message.id,
+            current_user.id,
+            partial(
+                _run_generation,
+                ai_message_id=ai_message.id,
+                model=ai_message.model,
+                provider=provider,
+                conversation=conversation,
+                user_id=current_user.id,
+                chat_id=chat.id,
+                ticket=ticket,
+                auto_title=needs_title and ai_message is ai_messages[0],
+                use_cache=use_cache
+            )
+        )
+        for ai_message, provider, conversation, ticket in zip(
+            ai_messages, providers, conversations, tickets
+        )
+    ]
+    for stream, ticket in zip(streams, tickets):
+        if ticket is not None:
+            # Also runs when the task is cancelled before it ever started
+            stream.task.add_done_callback(lambda _, ticket=ticket: ticket.release())
+    return ai_messages, streams
+
+
+async def start_generation(
+    db: AsyncSession,
+    current_user: User,
+    message_create: MessageCreate
+) -> tuple[MessageModel, list[MessageModel], list[GenerationStream]]:
+    """Store a user message and start its replies (shared by SSE and WebSocket)"""
     # Verify chat belongs to user
     result = await db.execute(
         select(ChatModel).where(
@@ -172,145 +465,285 @@ async def generate_message(
             detail="Chat not found"
         )
 
+    # An unnamed chat gets a title once its first reply completes; one
+    # whose earlier replies failed or were cancelled is still eligible
+    needs_title = chat.title == DEFAULT_CHAT_TITLE and not await _has_titled_reply(db, chat.id)
+
+    # Clients regenerate by re-sending the prompt; that must not replay the cache
+    repeated = await _is_repeated_prompt(
+        db, chat.id, message_create.parent_id, message_create.content
+    )
+
+    providers, models = _resolve_models(
+        chat, message_create.models, message_create.fan_out, message_create.model
+    )
+    tickets = _admit(current_user, providers, models)
+    try:
+        return await _store_and_start(
+            db, current_user, chat, message_create, providers, models, tickets, needs_title,
+            use_cache=not repeated
+        )
+    except BaseException:
+        _release(tickets)
+        raise
+
+
+def _release(tickets: list[Optional[Ticket]]):
+    """Free reserved queue places of generations that were never started"""
+    for ticket in tickets:
+        if ticket is not None:
+            ticket.release()
+
+
+async def _store_and_start(
+    db: AsyncSession,
+    current_user: User,
+    chat: ChatModel,
+    message_create: MessageCreate,
+    providers,
+    models,
+    tickets: list[Optional[Ticket]],
+    needs_title: bool,
+    use_cache: bool
+) -> tuple[MessageModel, list[MessageModel], list[GenerationStream]]:
+    """Write the user message and start its replies on the reserved tickets"""
     # Create user message
     user_message = MessageModel(
         id=str(uuid4()),
         chat_id=message_create.chat_id,
         parent_id=message_create.parent_id,
-        children_ids=[],
         role=message_create.role,
         content=message_create.content,
         model=message_create.model,
-        files=message_create.files,
+        files=_files_json(message_create.files),
         status=MessageStatus.COMPLETED
     )
 
     db.add(user_message)
 
-    # Update parent message's children
+    # The parent's children are derived from parent_id; only tell sync it changed
     if message_create.parent_id:
-        result = await db.execute(
-            select(MessageModel).where(MessageModel.id == message_create.parent_id)
-        )
-        parent = result.scalar_one_or_none()
-        if parent:
-            parent.children_ids = parent.children_ids + [user_message.id]
+        SyncService.record(db, current_user.id, MESSAGE, message_create.parent_id, chat_id=chat.id)
 
+    await SearchService.index_message(db, user_message.id, user_message.content)
+    await db.execute(ChatModel.record_activity(chat.id, user_message.content, added=1))
     await db.commit()
     await db.refresh(user_message)
 
-    # Create AI message placeholder
-    # Use default model based on provider if not specified
-    if settings.default_ai_provider == "openai":
-        default_model = settings.openai_model
-    elif settings.default_ai_provider == "gemini":
-        default_model = settings.gemini_model
-    else:
-        default_model = settings.ollama_model
-
-    ai_message_id = str(uuid4())
-    ai_message = MessageModel(
-        id=ai_message_id,
-        chat_id=message_create.chat_id,
-        parent_id=user_message.id,
-        children_ids=[],
-        role="assistant",
-        content="",
-        model=message_create.model or default_model,
-        status=MessageStatus.STREAMING
+    ai_messages, streams = await _start_replies(
+        db, current_user, chat, user_message, providers, models, tickets, needs_title,
+        use_cache=use_cache
     )
+    return user_message, ai_messages, streams
 
-    db.add(ai_message)
-    user_message.children_ids = [ai_message_id]
-
-    await db.commit()
-    await db.refresh(ai_message)
 
-    # Get conversation history
+async def start_regeneration(
+    db: AsyncSession,
+    current_user: User,
+    message_id: str,
+    models: Optional[List[str]] = None
+) -> tuple[list[MessageModel], list[GenerationStream]]:
+    """Answer an assistant message's prompt again, as new sibling replies"""
     result = await db.execute(
-        select(MessageModel)
-        .where(MessageModel.chat_id == message_create.chat_id)
-        .order_by(MessageModel.timestamp.asc())
+        select(MessageModel, ChatModel)
+        .join(ChatModel, ChatModel.id == MessageModel.chat_id)
+        .where((MessageModel.id == message_id) & (ChatModel.user_id == current_user.id))
     )
-    all_messages = result.scalars().all()
+    message, chat = result.one_or_none() or (None, None)
 
-    # Convert to OpenAI format
-    conversation = [
-        {"role": msg.role.value, "content": msg.content}
-        for msg in all_messages
-        if msg.role.value in ["user", "assistant", "system"]
-    ]
+    if not message or message.role.value != "assistant" or not message.parent_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assistant message not found"
+        )
 
-    # Stream AI response
-    async def stream_response():
-        ai_service = AIService()
-        full_content = ""
+    user_message = await db.get(MessageModel, message.parent_id)
+    if user_message is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prompt message not found"
+        )
 
-        try:
-            # Determine provider: use default from settings, or infer from model name
-            provider = settings.default_ai_provider
-            model_lower = ai_message.model.lower()
+    providers, models = _resolve_models(chat, models, False, message.model)
+    tickets = _admit(current_user, providers, models)
+    try:
+        return await _start_replies(
+            db, current_user, chat, user_message, providers, models, tickets, use_cache=False
+        )
+    except BaseException:
+        _release(tickets)
+        raise
 
-            if "gpt" in model_lower or "openai" in model_lower:
-                provider = "openai"
-            elif "gemini" in model_lower:
-                provider = "gemini"
-            elif "llama" in model_lower or "mistral" in model_lower or "qwen" in model_lower:
-                provider = "ollama"
 
-            print(f"Using provider: {provider}, model: {ai_message.model}")
+@router.post("/generate", response_class=StreamingResponse)
+async def generate_message(
+    message_create: MessageCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Generate AI response for a message (streaming)"""
+    _, ai_messages, streams = await start_generation(db, current_user, message_create)
 
-            async for chunk in ai_service.generate_completion_stream(
-                messages=conversation,
-                model=ai_message.model,
-                provider=provider
-            ):
-                full_content += chunk
-
-                # Send chunk as SSE
-                yield f"data: {json.dumps({'chunk': chunk, 'message_id': ai_message_id})}\n\n"
-
-            # Update message with final content
-            async with AsyncSessionLocal() as update_db:
-                result = await update_db.execute(
-                    select(MessageModel).where(MessageModel.id == ai_message_id)
-                )
-                msg = result.scalar_one_or_none()
-                if msg:
-                    msg.content = full_content
-                    msg.status = MessageStatus.COMPLETED
-                    await update_db.commit()
-
-            yield f"data: {json.dumps({'done': True, 'message_id': ai_message_id})}\n\n"
-
-        except Exception as e:
-            # Log error for debugging
-            import traceback
-            print(f"Error generating AI response: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
-
-            # Update message status to error
-            async with AsyncSessionLocal() as update_db:
-                result = await update_db.execute(
-                    select(MessageModel).where(MessageModel.id == ai_message_id)
-                )
-                msg = result.scalar_one_or_none()
-                if msg:
-                    msg.status = MessageStatus.ERROR
-                    msg.content = full_content or f"Error generating response: {str(e)}"
-                    await update_db.commit()
-
-            yield f"data: {json.dumps({'error': str(e), 'message_id': ai_message_id})}\n\n"
+    if len(streams) == 1:
+        events = sse_events(streams[0])
+    else:
+        # Multiplex on one response; each message stays resumable on its own
+        events = merged_sse_events(streams, {
+            'fan_out': [
+                {'message_id': ai_message.id, 'model': ai_message.model}
+                for ai_message in ai_messages
+            ]
+        })
 
     return StreamingResponse(
-        stream_response(),
+        events,
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
+        headers=SSE_HEADERS
+    )
+
+
+async def _run_generation(
+    stream,
+    ai_message_id: str,
+    model: str,
+    provider: str,
+    conversation: list[dict],
+    user_id: str,
+    chat_id: str,
+    ticket: Optional[Ticket] = None,
+    auto_title: bool = False,
+    use_cache: bool = True
+):
+    """Generate one AI response in the background; HTTP clients subscribe to it"""
+    ai_service = AIService()
+    persister = StreamPersister(ai_message_id, user_id=user_id, chat_id=chat_id)
+
+    async def report_position(position: int):
+        await stream.publish({'queued': position, 'message_id': ai_message_id, 'model': model})
+
+    try:
+        if ticket is not None:
+            await ticket.acquire(on_position=report_position)
+
+        print(f"Using provider: {provider}, model: {model}")
+
+        async for chunk in ai_service.generate_completion_stream(
+            messages=conversation,
+            model=model,
+            provider=provider,
+            use_cache=use_cache
+        ):
+            # Publish chunk before the (occasional) checkpoint write
+            await stream.publish({'chunk': chunk, 'message_id': ai_message_id, 'model': model})
+
+            await persister.append(chunk)
+
+        if ai_service.served_by != (provider, model):
+            # Failed over or hedged to a secondary target
+            served_provider, served_model = ai_service.served_by
+            persister.metadata["served_by"] = {"provider": served_provider, "model": served_model}
+
+        # Update message with final content
+        await persister.finalize(MessageStatus.COMPLETED)
+
+        await stream.publish({'done': True, 'message_id': ai_message_id, 'model': model})
+
+        if auto_title:
+            title_worker.submit(TitleJob(
+                chat_id=chat_id,
+                user_id=user_id,
+                provider=provider,
+                model=model,
+                question=conversation[-1]["content"],
+                answer=persister.content
+            ))
+
+    except asyncio.CancelledError:
+        # Cancelled by the client (or shutdown): keep what was streamed so far
+        if not persister.finished:
+            persister.metadata["cancelled"] = True
+            await persister.finalize(MessageStatus.COMPLETED)
+        await stream.publish({'done': True, 'cancelled': True, 'message_id': ai_message_id, 'model': model})
+        raise
+
+    except Exception as e:
+        # Log error for debugging
+        import traceback
+        print(f"Error generating AI response: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+
+        # Update message status to error; subscribers hear about it either way
+        try:
+            await persister.finalize(
+                MessageStatus.ERROR,
+                persister.content or f"Error generating response: {str(e)}"
+            )
+        except Exception as write_error:
+            print(f"Error saving failed response: {str(write_error)}")
+
+        await stream.publish({'error': str(e), 'message_id': ai_message_id, 'model': model})
+
+    finally:
+        if ticket is not None:
+            # Free the slot as soon as the provider is done; the task's
+            # done-callback covers cancellation before this code runs
+            ticket.release()
+        await persister.close()
+
+
+@router.get("/{message_id}/stream", response_class=StreamingResponse)
+async def stream_message(
+    message_id: str,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Attach to an in-flight generation, replaying events after Last-Event-ID"""
+    if last_event_id is None:
+        try:
+            last_event_id = int(last_event_id_header or 0)
+        except ValueError:
+            last_event_id = 0
+
+    stream = stream_broker.get(message_id)
+
+    if stream is not None:
+        if stream.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+
+        return StreamingResponse(
+            sse_events(stream, last_event_id),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
+        )
+
+    # Not live in this worker: serve the stored state once
+    result = await db.execute(
+        select(MessageModel)
+        .join(ChatModel, ChatModel.id == MessageModel.chat_id)
+        .where((MessageModel.id == message_id) & (ChatModel.user_id == current_user.id))
     )
+    message = result.scalar_one_or_none()
 
+    if not message:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found"
+        )
 
-# Import async session maker
-from app.database import AsyncSessionLocal
+    async def stored_events():
+        yield format_sse({'snapshot': message.content, 'message_id': message_id})
+        if message.status == MessageStatus.COMPLETED:
+            yield format_sse({'done': True, 'message_id': message_id})
+        elif message.status == MessageStatus.ERROR:
+            yield format_sse({'error': message.content, 'message_id': message_id})
+
+    return StreamingResponse(
+        stored_events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
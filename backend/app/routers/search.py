@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.config import get_settings
+from app.database import get_read_db
+from app.models.user import User
+from app.schemas.search import SearchResult
+from app.routers.auth import get_current_user
+from app.services.search import SearchService
+
+settings = get_settings()
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("", response_model=List[SearchResult])
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=settings.search_limit_max),
+    chat_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Full-text search over the current user's messages, best matches first"""
+    try:
+        return await SearchService.search(db, current_user.id, q, limit, chat_id=chat_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not available on this database"
+        )
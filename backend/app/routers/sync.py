@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import get_read_db
+from app.models.user import User
+from app.schemas.sync import SyncResponse
+from app.routers.auth import get_current_user
+from app.services.sync import SyncService
+
+settings = get_settings()
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: int = Query(0, ge=0),
+    limit: int = Query(settings.page_size_max, ge=1, le=settings.page_size_max),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get chats and messages created, updated or deleted after a cursor"""
+    return await SyncService.get_changes(db, current_user.id, since, limit)
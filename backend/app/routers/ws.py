@@ -0,0 +1,239 @@
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from typing import Optional
+import asyncio
+import json
+import time
+
+from app.database import AsyncSessionLocal
+from app.metrics import ws_connections_active
+from app.models.user import User
+from app.routers.messages import start_generation, start_regeneration
+from app.schemas.message import MessageCreate
+from app.schemas.ws import AttachCommand, CancelCommand, RegenerateCommand
+from app.services.auth import AuthService
+from app.services.broker import GenerationStream, stream_broker
+from app.services.events import user_events
+from app.utils.security import decode_access_token
+
+router = APIRouter(prefix="/ws", tags=["websocket"])
+
+# Close codes (4000-4999 are application defined)
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TOKEN_EXPIRED = 4001
+
+# Body schema per op (None: no fields)
+COMMANDS = {
+    "generate": MessageCreate,
+    "regenerate": RegenerateCommand,
+    "cancel": CancelCommand,
+    "attach": AttachCommand,
+    "ping": None
+}
+
+# Generation event keys shortened on the wire; message_id/model are implied
+COMPACT_KEYS = {"chunk": "c", "queued": "q"}
+IMPLIED_KEYS = ("message_id", "model")
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _frame(message_id: str, event_id: int, data: dict) -> str:
+    """Compact generation frame: {"m": message_id, "i": event_id, "c": chunk, ...}"""
+    frame = {"m": message_id, "i": event_id}
+    for key, value in data.items():
+        if key not in IMPLIED_KEYS:
+            frame[COMPACT_KEYS.get(key, key)] = value
+    return _dumps(frame)
+
+
+async def _authenticate(websocket: WebSocket, token: Optional[str]) -> tuple[Optional[User], Optional[float]]:
+    """(user, token expiry) from ?token= or the Authorization header"""
+    if not token:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+
+    payload = decode_access_token(token) if token else None
+    if payload is None or payload.get("sub") is None:
+        return None, None
+
+    async with AsyncSessionLocal() as db:
+        user = await AuthService.get_principal(db, payload["sub"], payload.get("exp"))
+    return user, payload.get("exp")
+
+
+class Connection:
+    """One authenticated socket carrying any number of generations
+
+    Client commands (JSON text frames, "ref" is echoed back):
+      {"op": "generate", "ref": ..., <MessageCreate fields>}
+      {"op": "regenerate", "ref": ..., "message_id": <assistant id>, "models": [...]}
+      {"op": "cancel", "message_id": ...}
+      {"op": "attach", "message_id": ..., "after": <last event id>}
+      {"op": "ping"}
+
+    Server frames: {"op": "started" | "cancelled" | "attached" | "error" |
+    "event" | "pong", ...} and generation frames keyed by message id (see
+    _frame). Every command with a ref gets exactly one op frame carrying it.
+    """
+
+    def __init__(self, websocket: WebSocket, user: User, expires_at: Optional[float]):
+        self.websocket = websocket
+        self.user = user
+        self.expires_at = expires_at
+        self.closed = False
+        self.followers: dict[str, asyncio.Task] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, data):
+        if self.closed:
+            return
+        async with self._send_lock:
+            await self.websocket.send_text(data if isinstance(data, str) else _dumps(data))
+
+    async def error(self, ref, status_code: int, detail, **extra):
+        await self.send({"op": "error", "ref": ref, "status": status_code, "detail": detail, **extra})
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def follow(self, stream: GenerationStream, after: int = 0):
+        """Forward a generation's events (replayed after event id `after`)"""
+        if stream.message_id in self.followers:
+            return
+        task = self._spawn(self._forward(stream, after))
+        self.followers[stream.message_id] = task
+        task.add_done_callback(lambda _: self.followers.pop(stream.message_id, None))
+
+    async def _forward(self, stream: GenerationStream, after: int):
+        try:
+            async for event_id, data in stream.subscribe(after):
+                await self.send(_frame(stream.message_id, event_id, data))
+        except (WebSocketDisconnect, RuntimeError):
+            # Socket closed under us; the generation itself keeps running
+            pass
+
+    async def _forward_user_events(self):
+        try:
+            with user_events.subscription(self.user.id) as queue:
+                while True:
+                    await self.send({"op": "event", **(await queue.get())})
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    async def _start(self, ref, params):
+        """Run generate/regenerate; announces the reply ids before their frames"""
+        try:
+            async with AsyncSessionLocal() as db:
+                if isinstance(params, MessageCreate):
+                    user_message, ai_messages, streams = await start_generation(db, self.user, params)
+                    started = {"op": "started", "ref": ref, "user_message_id": user_message.id}
+                else:
+                    ai_messages, streams = await start_regeneration(
+                        db, self.user, params.message_id, params.models
+                    )
+                    started = {"op": "started", "ref": ref}
+
+            started["replies"] = [{"m": m.id, "model": m.model} for m in ai_messages]
+            await self.send(started)
+            for stream in streams:
+                self.follow(stream)
+
+        except HTTPException as e:
+            extra = {"retry_after": int(e.headers["Retry-After"])} if e.headers else {}
+            await self.error(ref, e.status_code, e.detail, **extra)
+        except Exception as e:
+            print(f"Error starting generation over WebSocket: {str(e)}")
+            await self.error(ref, status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
+
+    async def handle(self, command: dict):
+        op = command.get("op")
+        ref = command.get("ref")
+        if not isinstance(op, str) or op not in COMMANDS:
+            await self.error(ref, status.HTTP_400_BAD_REQUEST, f"Unknown op: {op}")
+            return
+
+        schema = COMMANDS[op]
+        try:
+            params = schema.model_validate(
+                {key: value for key, value in command.items() if key not in ("op", "ref")}
+            ) if schema else None
+        except ValidationError as e:
+            await self.error(ref, status.HTTP_422_UNPROCESSABLE_ENTITY, json.loads(e.json()))
+            return
+
+        if op in ("generate", "regenerate"):
+            # Set-up writes to the database; keep reading commands meanwhile
+            self._spawn(self._start(ref, params))
+        elif op == "cancel":
+            if stream_broker.cancel(params.message_id, self.user.id):
+                await self.send({"op": "cancelled", "ref": ref, "message_id": params.message_id})
+            else:
+                await self.error(ref, status.HTTP_404_NOT_FOUND, "No running generation")
+        elif op == "attach":
+            stream = stream_broker.get(params.message_id)
+            if stream is None or stream.user_id != self.user.id:
+                await self.error(ref, status.HTTP_404_NOT_FOUND, "No active stream for this message")
+            else:
+                # Acknowledged before the replayed frames start
+                await self.send({"op": "attached", "ref": ref, "message_id": params.message_id})
+                self.follow(stream, params.after)
+        else:
+            await self.send({"op": "pong", "ref": ref})
+
+    async def run(self):
+        events = self._spawn(self._forward_user_events())
+        try:
+            while True:
+                timeout = self.expires_at - time.time() if self.expires_at else None
+                try:
+                    text = await asyncio.wait_for(self.websocket.receive_text(), timeout)
+                except asyncio.TimeoutError:
+                    await self.websocket.close(code=CLOSE_TOKEN_EXPIRED)
+                    break
+
+                try:
+                    command = json.loads(text)
+                except ValueError:
+                    command = None
+                if not isinstance(command, dict):
+                    await self.error(None, status.HTTP_400_BAD_REQUEST, "Frames must be JSON objects")
+                    continue
+                try:
+                    await self.handle(command)
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    # One bad command must not take the connection down
+                    print(f"Error handling WebSocket command: {str(e)}")
+                    await self.error(command.get("ref"), status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Generations keep running (and persisting); only forwarding stops
+            self.closed = True
+            events.cancel()
+            for task in list(self.followers.values()):
+                task.cancel()
+
+
+@router.websocket("")
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """Multiplexed generation transport, authenticated once per connection"""
+    user, expires_at = await _authenticate(websocket, token)
+    if user is None:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    ws_connections_active.inc()
+    try:
+        await Connection(websocket, user, expires_at).run()
+    finally:
+        ws_connections_active.dec()
@@ -1,9 +1,17 @@
 from app.schemas.user import User, UserCreate, UserLogin, Token
 from app.schemas.chat import Chat, ChatCreate, ChatUpdate
-from app.schemas.message import Message, MessageCreate, MessageUpdate
+from app.schemas.message import Message, MessageCreate, MessageSummary, MessageUpdate
+from app.schemas.file import FileInfo
+from app.schemas.search import SearchResult
+from app.schemas.sync import SyncResponse
+from app.schemas.ws import AttachCommand, CancelCommand, RegenerateCommand
 
 __all__ = [
     "User", "UserCreate", "UserLogin", "Token",
     "Chat", "ChatCreate", "ChatUpdate",
-    "Message", "MessageCreate", "MessageUpdate"
+    "Message", "MessageCreate", "MessageSummary", "MessageUpdate",
+    "FileInfo",
+    "SearchResult",
+    "SyncResponse",
+    "AttachCommand", "CancelCommand", "RegenerateCommand"
 ]
@@ -22,6 +22,9 @@ class Chat(ChatBase):
     user_id: str
     created_at: datetime
     updated_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
+    message_count: int = 0
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,10 @@
+from datetime import datetime
+from typing import Optional
+
+from app.schemas.message import MessageFile
+
+
+class FileInfo(MessageFile):
+    """Upload result; attach it to a message's files as-is"""
+    sha256: str
+    created_at: Optional[datetime] = None
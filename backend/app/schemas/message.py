@@ -1,8 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from enum import Enum
 
+from app.config import get_settings
+
+settings = get_settings()
+
 
 class MessageRole(str, Enum):
     USER = "user"
@@ -35,6 +39,9 @@ class MessageBase(BaseModel):
 class MessageCreate(MessageBase):
     chat_id: str
     parent_id: Optional[str] = None
+    # Generation only: answer with several models at once as sibling replies
+    models: Optional[List[str]] = Field(None, max_length=settings.max_fan_out)
+    fan_out: bool = False  # use the chat's selected_models when models is empty
 
 
 class MessageUpdate(BaseModel):
@@ -43,6 +50,24 @@ class MessageUpdate(BaseModel):
     status: Optional[MessageStatus] = None
 
 
+class MessageSummary(BaseModel):
+    """List-view projection: tree links, status and a content preview"""
+    id: str
+    chat_id: str
+    parent_id: Optional[str] = None
+    children_ids: List[str] = []
+    role: MessageRole
+    model: Optional[str] = None
+    status: MessageStatus
+    timestamp: datetime
+    rating: Optional[int] = None
+    preview: str = ""
+    content_length: int = 0
+
+    class Config:
+        from_attributes = True
+
+
 class Message(MessageBase):
     id: str
     chat_id: str
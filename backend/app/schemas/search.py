@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from app.schemas.message import MessageRole
+
+
+class SearchResult(BaseModel):
+    """A matching message; snippet is HTML-escaped with <mark> around hits"""
+    message_id: str
+    chat_id: str
+    chat_title: Optional[str] = None
+    role: MessageRole
+    timestamp: datetime
+    snippet: str
+    score: float
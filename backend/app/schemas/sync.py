@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+
+from app.schemas.chat import Chat
+from app.schemas.message import Message
+
+
+class SyncResponse(BaseModel):
+    cursor: int  # pass back as ?since= on the next call
+    has_more: bool = False
+    reset: bool = False  # cursor too old: refetch everything, then sync from cursor
+    chats: List[Chat] = []
+    messages: List[Message] = []
+    deleted_chats: List[str] = []
+    deleted_messages: List[str] = []
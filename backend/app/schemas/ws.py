@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+# WebSocket command bodies ("op" and "ref" are handled by the connection);
+# "generate" takes MessageCreate
+
+
+class RegenerateCommand(BaseModel):
+    message_id: str  # assistant message to answer again
+    models: Optional[List[str]] = Field(None, max_length=settings.max_fan_out)
+
+
+class CancelCommand(BaseModel):
+    message_id: str
+
+
+class AttachCommand(BaseModel):
+    message_id: str
+    after: int = Field(0, ge=0)  # last event id already received
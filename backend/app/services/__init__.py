@@ -1,4 +1,44 @@
 from app.services.auth import AuthService
 from app.services.ai import AIService
+from app.services.broker import GenerationStream, StreamBroker, stream_broker
+from app.services.completion_cache import CompletionCache, completion_cache
+from app.services.context import ContextManager
+from app.services.conversation import ConversationService
+from app.services.events import UserEvents, user_events
+from app.services.files import FileService, FileTooLarge
+from app.services.providers import ProviderClients, provider_clients
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpen,
+    ResiliencePolicy,
+    resilience_policy
+)
+from app.services.retrieval import RetrievalService
+from app.services.routing import Endpoint, ModelRouter, model_router
+from app.services.scheduler import (
+    GenerationScheduler,
+    QueueTimeout,
+    SchedulerBusy,
+    generation_scheduler
+)
+from app.services.search import SearchService
+from app.services.streaming import StreamPersister, recover_orphaned_streams, sweep_orphaned_streams
+from app.services.sync import SyncService, prune_changes
+from app.services.titles import TitleJob, TitleWorker, title_worker
 
-__all__ = ["AuthService", "AIService"]
+__all__ = [
+    "AuthService", "AIService", "CompletionCache", "completion_cache",
+    "ContextManager", "ConversationService",
+    "GenerationStream", "StreamBroker", "stream_broker",
+    "ProviderClients", "provider_clients",
+    "CircuitBreaker", "CircuitOpen", "ResiliencePolicy", "resilience_policy",
+    "Endpoint", "ModelRouter", "model_router",
+    "GenerationScheduler", "QueueTimeout", "SchedulerBusy", "generation_scheduler",
+    "FileService", "FileTooLarge",
+    "RetrievalService",
+    "SearchService",
+    "StreamPersister", "recover_orphaned_streams", "sweep_orphaned_streams",
+    "SyncService", "prune_changes",
+    "TitleJob", "TitleWorker", "title_worker",
+    "UserEvents", "user_events"
+]
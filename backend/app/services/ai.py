@@ -1,7 +1,13 @@
 from typing import AsyncGenerator
-import httpx
-from openai import AsyncOpenAI
+import asyncio
+import json
+import time
 from app.config import get_settings
+from app import metrics
+from app.services.completion_cache import CompletionCache, completion_cache
+from app.services.providers import ProviderClients, provider_clients
+from app.services.resilience import ResiliencePolicy, resilience_policy
+from app.services.routing import ModelRouter, model_router
 
 settings = get_settings()
 
@@ -9,49 +15,146 @@ settings = get_settings()
 class AIService:
     """AI service for generating chat completions"""
 
-    def __init__(self):
-        self.openai_client = None
-        self.gemini_client = None
-
-        if settings.openai_api_key:
-            self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
-
-        if settings.gemini_api_key:
-            self.gemini_client = AsyncOpenAI(
-                api_key=settings.gemini_api_key,
-                base_url=settings.gemini_base_url
-            )
+    def __init__(
+        self,
+        clients: ProviderClients = None,
+        cache: CompletionCache = None,
+        policy: ResiliencePolicy = None,
+        router: ModelRouter = None
+    ):
+        # Clients are pooled process-wide; constructing an AIService is cheap
+        self.clients = clients or provider_clients
+        self.cache = cache or completion_cache
+        self.policy = policy or resilience_policy
+        self.router = router or model_router
+        # (provider, model) that actually served the last stream
+        self.served_by = None
+
+    @property
+    def openai_client(self):
+        return self.clients.openai_client
+
+    @property
+    def gemini_client(self):
+        return self.clients.gemini_client
 
     async def generate_completion_stream(
         self,
         messages: list[dict],
         model: str = None,
-        provider: str = None
+        provider: str = None,
+        use_cache: bool = True
     ) -> AsyncGenerator[str, None]:
-        """Generate streaming completion from AI model"""
-        provider = provider or settings.default_ai_provider
-
-        # Determine model based on provider
-        if not model:
-            if provider == "openai":
-                model = settings.openai_model
-            elif provider == "ollama":
-                model = settings.ollama_model
-            elif provider == "gemini":
-                model = settings.gemini_model
+        """Generate streaming completion from AI model
 
-        if provider == "openai":
-            async for chunk in self._generate_openai_stream(messages, model):
+        use_cache=False always asks the provider (regenerating a reply).
+        """
+        provider, model = self.router.resolve(model, provider)
+
+        if not self.clients.started:
+            await self.clients.start()
+
+        self.served_by = (provider, model)
+
+        if not self.cache.enabled or not use_cache:
+            async for chunk in self._generate_with_policy(messages, model, provider):
                 yield chunk
-        elif provider == "ollama":
-            async for chunk in self._generate_ollama_stream(messages, model):
+            return
+
+        # Replay an identical earlier completion instead of calling the provider
+        key = self.cache.make_key(provider, model, messages)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            for chunk in cached:
                 yield chunk
-        elif provider == "gemini":
-            async for chunk in self._generate_gemini_stream(messages, model):
+            return
+
+        chunks = []
+        async for chunk in self._generate_with_policy(messages, model, provider):
+            chunks.append(chunk)
+            yield chunk
+
+        if self.served_by != (provider, model):
+            # Failed over or hedged: file the reply under the model that wrote it
+            key = self.cache.make_key(*self.served_by, messages)
+        await self.cache.set(key, chunks)
+
+    async def _generate_with_policy(
+        self,
+        messages: list[dict],
+        model: str,
+        provider: str
+    ) -> AsyncGenerator[str, None]:
+        """Apply hedging/failover/circuit breaking when enabled"""
+        if not settings.resilience_enabled:
+            async for chunk in self._generate_provider_stream(messages, model, provider):
                 yield chunk
-        else:
+            return
+
+        def on_target(target):
+            self.served_by = target
+
+        async for chunk in self.policy.stream(
+            lambda p, m: self._generate_provider_stream(messages, m, p),
+            (provider, model),
+            on_target
+        ):
+            yield chunk
+
+    async def _generate_provider_stream(
+        self,
+        messages: list[dict],
+        model: str,
+        provider: str
+    ) -> AsyncGenerator[str, None]:
+        """Dispatch to the provider-specific streaming implementation"""
+        if provider not in ("openai", "ollama", "gemini"):
             raise ValueError(f"Unknown AI provider: {provider}")
 
+        endpoint = self.router.pick(provider, model)
+        if provider == "openai":
+            stream = self._generate_openai_stream(messages, model)
+        elif provider == "ollama":
+            stream = self._generate_ollama_stream(messages, model, endpoint.url)
+        else:
+            stream = self._generate_gemini_stream(messages, model)
+
+        started = time.perf_counter()
+        first_token_at = None
+        tokens = 0
+        outcome = "error"
+        try:
+            async with self.router.track(endpoint) as tracker:
+                async for chunk in stream:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        metrics.generation_ttft.observe(
+                            first_token_at - started, provider=provider, model=model
+                        )
+                    tracker.token()
+                    tokens += 1
+                    yield chunk
+            outcome = "success"
+        except (GeneratorExit, asyncio.CancelledError):
+            # Consumer stopped early (client gone, or a losing hedge)
+            outcome = "cancelled"
+            raise
+        finally:
+            self._record_stream_metrics(provider, model, started, first_token_at, tokens, outcome)
+
+    @staticmethod
+    def _record_stream_metrics(provider, model, started, first_token_at, tokens, outcome):
+        finished = time.perf_counter()
+        labels = {"provider": provider, "model": model}
+        metrics.generations.inc(outcome=outcome, **labels)
+        metrics.generation_duration.observe(finished - started, **labels)
+        if tokens:
+            metrics.generation_tokens.inc(tokens, **labels)
+        if first_token_at is not None and tokens > 1 and finished > first_token_at:
+            metrics.generation_tokens_per_second.observe(
+                (tokens - 1) / (finished - first_token_at), **labels
+            )
+
     async def _generate_openai_stream(
         self,
         messages: list[dict],
@@ -74,29 +177,27 @@ class AIService:
     async def _generate_ollama_stream(
         self,
         messages: list[dict],
-        model: str
+        model: str,
+        url: str = None
     ) -> AsyncGenerator[str, None]:
         """Generate streaming completion from Ollama"""
-        url = f"{settings.ollama_base_url}/api/chat"
-
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream(
-                "POST",
-                url,
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "stream": True
-                }
-            ) as response:
-                response.raise_for_status()
-
-                async for line in response.aiter_lines():
-                    if line:
-                        import json
-                        data = json.loads(line)
-                        if "message" in data and "content" in data["message"]:
-                            yield data["message"]["content"]
+        client = self.clients.ollama_for(url) if url else self.clients.ollama_client
+        async with client.stream(
+            "POST",
+            "/api/chat",
+            json={
+                "model": model,
+                "messages": messages,
+                "stream": True
+            }
+        ) as response:
+            response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                if line:
+                    data = json.loads(line)
+                    if "message" in data and "content" in data["message"]:
+                        yield data["message"]["content"]
 
     async def _generate_gemini_stream(
         self,
@@ -1,12 +1,37 @@
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, event
 from fastapi import HTTPException, status
 from uuid import uuid4
+import time
 
+from app.config import get_settings
+from app.models.change import SyncCounter
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.utils.security import verify_password, get_password_hash, create_access_token
+from app.utils.cache import TTLCache
+from app.utils.security import (
+    verify_password_async,
+    get_password_hash_async,
+    create_access_token,
+    PasswordHasherBusy
+)
+
+settings = get_settings()
+
+# Authenticated principals keyed by (sub, exp) of the access token
+principal_cache = TTLCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl
+)
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": str(settings.password_hash_retry_after)},
+    )
 
 
 class AuthService:
@@ -35,17 +60,23 @@ class AuthService:
                     detail="Username already taken"
                 )
 
+        try:
+            hashed_password = await get_password_hash_async(user_create.password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+
         # Create new user
         user = User(
             id=str(uuid4()),
             email=user_create.email,
             username=user_create.username,
-            hashed_password=get_password_hash(user_create.password),
+            hashed_password=hashed_password,
             is_active=True,
             is_superuser=False
         )
 
         db.add(user)
+        db.add(SyncCounter(user_id=user.id))
         await db.commit()
         await db.refresh(user)
 
@@ -61,8 +92,11 @@ class AuthService:
 
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
-            return None
+        try:
+            if not await verify_password_async(password, user.hashed_password):
+                return None
+        except PasswordHasherBusy:
+            raise _hasher_busy()
 
         return user
 
@@ -74,7 +108,36 @@ class AuthService:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_principal(db: AsyncSession, user_id: str, exp: Optional[float]) -> Optional[User]:
+        """Get the user for a verified token, served from the principal cache when possible"""
+        key = (user_id, exp)
+        user = principal_cache.get(key)
+        if user is not None:
+            return user
+
+        user = await AuthService.get_user_by_id(db, user_id)
+        if user is not None:
+            # Detach so the cached instance outlives this request's session
+            db.expunge(user)
+            ttl = exp - time.time() if exp is not None else None
+            principal_cache.set(key, user, ttl)
+
+        return user
+
+    @staticmethod
+    def invalidate_principal(user_id: str) -> int:
+        """Drop cached principals of a user (e.g. after deactivation or changes)"""
+        return principal_cache.invalidate(lambda key: key[0] == user_id)
+
     @staticmethod
     def create_user_token(user_id: str) -> str:
         """Create access token for user"""
         return create_access_token(data={"sub": user_id})
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(mapper, connection, target):
+    """Keep the principal cache consistent with user writes in this process"""
+    AuthService.invalidate_principal(target.id)
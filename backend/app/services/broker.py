@@ -0,0 +1,201 @@
+from collections import deque
+from typing import AsyncGenerator, Awaitable, Callable, Dict, Optional
+import asyncio
+import json
+
+from app.config import get_settings
+from app.metrics import sse_streams_active
+
+settings = get_settings()
+
+# Event keys that end a generation
+TERMINAL_KEYS = ("done", "error")
+
+
+def format_sse(data: dict, event_id: Optional[int] = None) -> str:
+    """Format a payload as a Server-Sent Event"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+class GenerationStream:
+    """Live event stream of one in-flight generation
+
+    Keeps a bounded replay buffer of numbered events so any number of
+    subscribers can attach late or reconnect with Last-Event-ID. Clients
+    that fell behind the buffer get a snapshot of the content so far.
+    """
+
+    def __init__(self, message_id: str, user_id: str, replay_size: Optional[int] = None):
+        self.message_id = message_id
+        self.user_id = user_id
+        self.events: deque = deque(maxlen=replay_size or settings.stream_replay_buffer)
+        self.chunks: list[str] = []
+        self.last_event_id = 0
+        self.finished = False
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    async def publish(self, data: dict):
+        """Append an event and wake every subscriber"""
+        async with self._changed:
+            self.last_event_id += 1
+            self.events.append((self.last_event_id, data))
+            if "chunk" in data:
+                self.chunks.append(data["chunk"])
+            self._changed.notify_all()
+
+    async def close(self):
+        """Mark the stream finished so subscribers drain and exit"""
+        async with self._changed:
+            self.finished = True
+            self._changed.notify_all()
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncGenerator[tuple, None]:
+        """Yield (event_id, data) after last_event_id until the stream ends"""
+        cursor = last_event_id
+
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self.last_event_id > cursor or self.finished
+                )
+
+                oldest = self.events[0][0] if self.events else self.last_event_id + 1
+                if cursor + 1 < oldest:
+                    # Fell behind the replay buffer: resync from a snapshot
+                    snapshot = {"snapshot": self.content, "message_id": self.message_id}
+                    last_id, last_data = self.events[-1] if self.events else (0, {})
+                    if any(key in last_data for key in TERMINAL_KEYS):
+                        pending = [(last_id - 1, snapshot), (last_id, last_data)]
+                    else:
+                        pending = [(self.last_event_id, snapshot)]
+                else:
+                    pending = [event for event in self.events if event[0] > cursor]
+
+                cursor = self.last_event_id
+                drained = self.finished
+
+            for event in pending:
+                yield event
+
+            if drained:
+                return
+
+
+class StreamBroker:
+    """In-process registry of in-flight generations keyed by message id
+
+    Generations run as background tasks that publish into their stream,
+    so an HTTP disconnect no longer stops (or duplicates) the provider
+    call. Finished streams linger briefly for late reconnects.
+    """
+
+    def __init__(self):
+        self.streams: Dict[str, GenerationStream] = {}
+
+    def get(self, message_id: str) -> Optional[GenerationStream]:
+        return self.streams.get(message_id)
+
+    def start(
+        self,
+        message_id: str,
+        user_id: str,
+        producer: Callable[[GenerationStream], Awaitable[None]]
+    ) -> GenerationStream:
+        """Register a stream and run producer(stream) in the background"""
+        stream = GenerationStream(message_id, user_id)
+        self.streams[message_id] = stream
+        stream.task = asyncio.create_task(self._run(stream, producer))
+        return stream
+
+    async def _run(self, stream: GenerationStream, producer):
+        try:
+            await producer(stream)
+        finally:
+            await stream.close()
+            asyncio.get_running_loop().call_later(
+                settings.stream_linger_seconds, self._evict, stream
+            )
+
+    def running_ids(self) -> set[str]:
+        """Message ids of generations still running in this process"""
+        return {
+            message_id for message_id, stream in self.streams.items()
+            if stream.task and not stream.task.done()
+        }
+
+    def cancel(self, message_id: str, user_id: str) -> bool:
+        """Stop a user's running generation; False if none is running"""
+        stream = self.streams.get(message_id)
+        if stream is None or stream.user_id != user_id or not stream.task or stream.task.done():
+            return False
+        stream.task.cancel()
+        return True
+
+    def _evict(self, stream: GenerationStream):
+        if self.streams.get(stream.message_id) is stream:
+            del self.streams[stream.message_id]
+
+    async def shutdown(self):
+        """Cancel running generations"""
+        tasks = [s.task for s in self.streams.values() if s.task and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.streams.clear()
+
+
+async def sse_events(stream: GenerationStream, last_event_id: int = 0) -> AsyncGenerator[str, None]:
+    """Render a stream subscription as SSE text"""
+    sse_streams_active.inc()
+    try:
+        async for event_id, data in stream.subscribe(last_event_id):
+            yield format_sse(data, event_id)
+    finally:
+        sse_streams_active.dec()
+
+
+async def merged_sse_events(
+    streams: list[GenerationStream],
+    header: Optional[dict] = None
+) -> AsyncGenerator[str, None]:
+    """Multiplex several streams onto one SSE response in arrival order
+
+    Events carry their message_id; ids are omitted because each stream has
+    its own sequence (resume per message via its own stream endpoint).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def forward(stream: GenerationStream):
+        try:
+            async for _, data in stream.subscribe():
+                await queue.put(data)
+        finally:
+            await queue.put(None)
+
+    tasks = [asyncio.create_task(forward(stream)) for stream in streams]
+    sse_streams_active.inc()
+    try:
+        if header is not None:
+            yield format_sse(header)
+
+        remaining = len(tasks)
+        while remaining:
+            data = await queue.get()
+            if data is None:
+                remaining -= 1
+                continue
+            yield format_sse(data)
+    finally:
+        sse_streams_active.dec()
+        for task in tasks:
+            task.cancel()
+
+
+# Shared instance for this worker process
+stream_broker = StreamBroker()
@@ -0,0 +1,121 @@
+from typing import Optional
+import hashlib
+import json
+
+from app.config import get_settings
+from app.utils.cache import TTLCache
+
+settings = get_settings()
+
+KEY_PREFIX = "completion:v2:"
+
+
+class CompletionCache:
+    """Exact-match cache of finished completions
+
+    A process-local LRU/TTL tier answers repeated prompts without I/O; when
+    ENABLE_REDIS is set, a shared Redis tier lets every worker reuse the
+    same entries. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self):
+        self.local = TTLCache(
+            maxsize=settings.completion_cache_size,
+            ttl=settings.completion_cache_ttl
+        )
+        self.redis = None
+        self.redis_hits = 0
+        self.redis_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.completion_cache_enabled
+
+    async def start(self):
+        """Connect the shared Redis tier if enabled"""
+        if not (self.enabled and settings.enable_redis):
+            return
+
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(settings.redis_url)
+        try:
+            await self.redis.ping()
+            print("Completion cache: Redis tier connected")
+        except Exception as e:
+            print(f"Completion cache: Redis unavailable ({e.__class__.__name__}), using memory only")
+            await self.redis.aclose()
+            self.redis = None
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: list[dict], params: Optional[dict] = None) -> str:
+        """Hash provider, model, messages and parameters
+
+        Content is hashed verbatim apart from trailing whitespace: inner
+        whitespace (indentation, line breaks) can change the answer.
+        """
+        normalized = {
+            "provider": provider,
+            "model": model,
+            "messages": [
+                {"role": m["role"], "content": m["content"].rstrip()}
+                for m in messages
+            ],
+            "params": params or {},
+        }
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[list[str]]:
+        """Get cached chunks, checking memory before Redis"""
+        chunks = self.local.get(key)
+        if chunks is not None or self.redis is None:
+            return chunks
+
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Completion cache: Redis get failed ({e.__class__.__name__})")
+            return None
+
+        if raw is None:
+            return None
+
+        chunks = json.loads(raw)
+        self.redis_hits += 1
+        self.local.set(key, chunks)
+        return chunks
+
+    async def set(self, key: str, chunks: list[str]):
+        """Store the chunks of a finished completion in every tier"""
+        if sum(len(chunk) for chunk in chunks) > settings.completion_cache_max_chars:
+            return
+
+        self.local.set(key, chunks)
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(key, json.dumps(chunks), ex=settings.completion_cache_ttl)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Completion cache: Redis set failed ({e.__class__.__name__})")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "redis": self.redis is not None,
+            "redis_hits": self.redis_hits,
+            "redis_errors": self.redis_errors,
+            **self.local.stats(),
+        }
+
+
+# Shared instance, connected and closed by the application lifespan
+completion_cache = CompletionCache()
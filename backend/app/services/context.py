@@ -0,0 +1,258 @@
+from typing import Callable, Optional
+from functools import lru_cache
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.message import Message as MessageModel
+from app.services.ai import AIService
+from app.services.routing import model_router
+from app.services.scheduler import SchedulerBusy, generation_scheduler
+
+try:
+    import tiktoken
+except ImportError:  # listed in requirements.txt; without it every count is estimated
+    tiktoken = None
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Cache key of estimated counts; never a tokenizer's name, so estimates are
+# not mistaken for (or shadowed by) exact counts
+APPROX_TOKENIZER = "approx:chars"
+
+# Fixed per-message overhead for role and separators in chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# message_metadata keys computed from the content (dropped when it is edited)
+CONTENT_DERIVED_METADATA = ("tokens", "summary")
+
+SUMMARY_PROMPT = (
+    "Update the running summary of the conversation below. Keep names, facts, "
+    "decisions and open questions; drop small talk. Reply with the summary only."
+)
+
+
+def _approx_token_count(text: str) -> int:
+    """Estimate tokens without a tokenizer (~4 ASCII chars or 1 non-ASCII char per token)"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+@lru_cache(maxsize=32)
+def get_tokenizer(model: str) -> tuple[str, Callable[[str], int]]:
+    """Get (tokenizer name, token counter) for a model family
+
+    The tokenizer name is used as the cache key in message_metadata, so
+    counts are shared by every model that tokenizes the same way. OpenAI
+    models are counted exactly with tiktoken; other models (and OpenAI
+    models without tiktoken) get an estimate keyed APPROX_TOKENIZER.
+    """
+    model_lower = (model or "").lower()
+
+    if tiktoken is not None and ("gpt" in model_lower or model_lower.startswith("o1")):
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return encoding.name, lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    return APPROX_TOKENIZER, _approx_token_count
+
+
+class ContextManager:
+    """Fit conversation history into a token budget before generation
+
+    Per-message token counts are cached in message_metadata["tokens"] keyed
+    by tokenizer name, so history is tokenized at most once per tokenizer.
+    When enabled, turns that no longer fit are replaced by a rolling summary
+    stored on the last message it covers (so it stays branch-correct) and
+    extended incrementally in the background.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens: Optional[int] = None,
+        reserve_tokens: Optional[int] = None,
+        provider: Optional[str] = None,
+        user_id: Optional[str] = None
+    ):
+        self.model = model
+        self.provider = provider  # of model; summaries go to the same provider
+        self.user_id = user_id  # summaries queue behind this user's generations
+        self.max_tokens = max_tokens or settings.context_max_tokens
+        self.reserve_tokens = (
+            reserve_tokens if reserve_tokens is not None else settings.context_reserve_tokens
+        )
+        self.tokenizer_name, self.count_tokens = get_tokenizer(model)
+
+    @property
+    def budget(self) -> int:
+        return max(self.max_tokens - self.reserve_tokens, 0)
+
+    def _message_tokens(self, message: dict) -> int:
+        return self.count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    async def _ensure_token_counts(self, db: AsyncSession, history: list[dict]) -> list[int]:
+        """Return token counts for history, computing and caching missing ones"""
+        counts = []
+
+        for message in history:
+            metadata = message.get("metadata") or {}
+            cached = (metadata.get("tokens") or {}).get(self.tokenizer_name)
+
+            if cached is None:
+                cached = self._message_tokens(message)
+                metadata = {
+                    **metadata,
+                    "tokens": {**(metadata.get("tokens") or {}), self.tokenizer_name: cached}
+                }
+                message["metadata"] = metadata
+                await db.execute(
+                    update(MessageModel)
+                    .where(MessageModel.id == message["id"])
+                    .values(message_metadata=metadata)
+                )
+
+            counts.append(cached)
+
+        return counts
+
+    async def build(
+        self,
+        db: AsyncSession,
+        history: list[dict],
+        extra: Optional[dict] = None
+    ) -> list[dict]:
+        """Trim history (root first) to the budget and return it in OpenAI format
+
+        history items carry id, role, content and metadata, as returned by
+        ConversationService.get_ancestor_path. extra (e.g. retrieved
+        excerpts) is placed just before the latest turn and its tokens
+        come out of the budget first.
+        """
+        if not history:
+            return []
+
+        counts = await self._ensure_token_counts(db, history)
+        budget = self.budget
+        if extra is not None:
+            budget -= self._message_tokens(extra)
+
+        # Leading system prompts are always kept
+        head = 0
+        while head < len(history) - 1 and history[head]["role"] == "system":
+            budget -= counts[head]
+            head += 1
+
+        # Walk back from the newest message; the latest turn is always kept
+        start = len(history) - 1
+        used = counts[start]
+        while start - 1 >= head and used + counts[start - 1] <= budget:
+            start -= 1
+            used += counts[start]
+
+        kept = history[:head] + history[start:]
+        dropped = history[head:start]
+
+        if dropped and settings.context_summary_enabled:
+            summary = self._latest_summary(dropped)
+            if summary is not None:
+                summary_message = {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{summary['text']}"
+                }
+                if used + self._message_tokens(summary_message) <= budget:
+                    kept = history[:head] + [summary_message] + history[start:]
+
+            covered = summary["index"] if summary else -1
+            if covered < len(dropped) - 1:
+                self._schedule_summary(dropped, summary)
+
+        if extra is not None:
+            kept = kept[:-1] + [extra] + kept[-1:]
+
+        return [{"role": m["role"], "content": m["content"]} for m in kept]
+
+    @staticmethod
+    def _latest_summary(dropped: list[dict]) -> Optional[dict]:
+        """Find the newest stored summary among the dropped messages"""
+        for index in range(len(dropped) - 1, -1, -1):
+            summary = (dropped[index].get("metadata") or {}).get("summary")
+            if summary:
+                return {"index": index, "text": summary}
+        return None
+
+    def _schedule_summary(self, dropped: list[dict], previous: Optional[dict]):
+        """Extend the rolling summary off the request path"""
+        anchor_id = dropped[-1]["id"]
+        if anchor_id in _pending_summaries:
+            return
+        _pending_summaries.add(anchor_id)
+
+        start = previous["index"] + 1 if previous else 0
+        task = asyncio.create_task(
+            self._update_summary(
+                previous["text"] if previous else "",
+                dropped[start:],
+                dropped[-1]
+            )
+        )
+        _summary_tasks.add(task)
+        task.add_done_callback(_summary_tasks.discard)
+
+    async def _update_summary(self, previous: str, new_turns: list[dict], anchor: dict):
+        """Summarize new_turns on top of previous and store it on anchor"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in new_turns)
+        prompt = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+            },
+        ]
+
+        if settings.context_summary_model:
+            provider, model = model_router.resolve(settings.context_summary_model)
+        else:
+            provider, model = model_router.resolve(self.model, self.provider)
+
+        ticket = None
+        try:
+            if settings.scheduler_enabled:
+                # Summaries take a generation slot like any other completion
+                ticket = generation_scheduler.admit([(provider, model)], self.user_id or "")[0]
+                await ticket.acquire()
+            text = await AIService().generate_completion(prompt, model=model, provider=provider)
+            async with AsyncSessionLocal() as session:
+                # Merge into the row as it is now: token counts may have been
+                # cached on it while the summary was being generated
+                current = await session.scalar(
+                    select(MessageModel.message_metadata)
+                    .where(MessageModel.id == anchor["id"])
+                    .with_for_update()
+                )
+                await session.execute(
+                    update(MessageModel)
+                    .where(MessageModel.id == anchor["id"])
+                    .values(message_metadata={**(current or {}), "summary": text.strip()})
+                )
+                await session.commit()
+        except SchedulerBusy:
+            # Queues are full; the next request past the budget tries again
+            logger.info("Conversation summary skipped: generation queues are full")
+        except Exception:
+            logger.exception("Error updating conversation summary")
+        finally:
+            if ticket is not None:
+                ticket.release()
+            _pending_summaries.discard(anchor["id"])
+
+
+# Keep references so background summary tasks are not garbage collected
+_summary_tasks: set = set()
+_pending_summaries: set = set()
@@ -0,0 +1,99 @@
+from typing import Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, literal
+
+from app.models.message import Message as MessageModel
+
+# Guard against accidental parent_id cycles in corrupted data
+MAX_PATH_DEPTH = 10000
+
+
+class ConversationService:
+    """Conversation history loading"""
+
+    @staticmethod
+    async def children_of(db: AsyncSession, message_ids: Sequence[str]) -> dict[str, list[str]]:
+        """Map each message id to its reply ids (time order) in one indexed query"""
+        children: dict[str, list[str]] = {message_id: [] for message_id in message_ids}
+        if not children:
+            return children
+
+        result = await db.execute(
+            select(MessageModel.parent_id, MessageModel.id)
+            .where(MessageModel.parent_id.in_(list(children)))
+            .order_by(MessageModel.timestamp.asc(), MessageModel.id.asc())
+        )
+        for parent_id, child_id in result:
+            children[parent_id].append(child_id)
+        return children
+
+    @staticmethod
+    async def load_children(db: AsyncSession, messages: Sequence[MessageModel]):
+        """Fill in children_ids of ORM messages from the parent_id index"""
+        children = await ConversationService.children_of(db, [m.id for m in messages])
+        for message in messages:
+            message.children_ids = children[message.id]
+
+    @staticmethod
+    async def get_ancestor_path(
+        db: AsyncSession,
+        chat_id: str,
+        message_id: str
+    ) -> list[dict]:
+        """Get the branch from the root down to message_id
+
+        Walks parent_id links with a single recursive CTE (portable across
+        SQLite and PostgreSQL), so sibling branches created by edits and
+        regenerations are never read or sent to the model. Each item has
+        id, role, content and metadata (for cached token counts).
+        """
+        ancestors = (
+            select(
+                MessageModel.id,
+                MessageModel.parent_id,
+                MessageModel.role,
+                MessageModel.content,
+                MessageModel.message_metadata,
+                literal(0).label("depth")
+            )
+            .where(
+                (MessageModel.id == message_id) & (MessageModel.chat_id == chat_id)
+            )
+            .cte("ancestors", recursive=True)
+        )
+
+        ancestors = ancestors.union_all(
+            select(
+                MessageModel.id,
+                MessageModel.parent_id,
+                MessageModel.role,
+                MessageModel.content,
+                MessageModel.message_metadata,
+                (ancestors.c.depth + 1).label("depth")
+            )
+            .join(ancestors, MessageModel.id == ancestors.c.parent_id)
+            .where(
+                (MessageModel.chat_id == chat_id) & (ancestors.c.depth < MAX_PATH_DEPTH)
+            )
+        )
+
+        result = await db.execute(
+            select(
+                ancestors.c.id,
+                ancestors.c.role,
+                ancestors.c.content,
+                ancestors.c.message_metadata
+            )
+            .order_by(ancestors.c.depth.desc())
+        )
+
+        return [
+            {
+                "id": row.id,
+                "role": row.role.value,
+                "content": row.content,
+                "metadata": row.message_metadata
+            }
+            for row in result
+            if row.role.value in ["user", "assistant", "system"]
+        ]
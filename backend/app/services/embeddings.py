@@ -0,0 +1,107 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+import asyncio
+import re
+import zlib
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.providers import provider_clients
+
+settings = get_settings()
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Batches at least this large are hashed in a worker thread
+HASHING_THREAD_MIN_BATCH = 8
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.maximum(norms, 1e-12)
+    return vectors
+
+
+class Embedder(ABC):
+    """Turns texts into unit-length float32 vectors
+
+    name identifies the vector space; indexes built by one embedder are
+    never queried with another.
+    """
+
+    name: str
+    dim: int
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """One row per text, in order"""
+
+
+class HashingEmbedder(Embedder):
+    """Local feature-hashing embedder (CPU only, no model files, works offline)
+
+    Word unigrams and bigrams are hashed into signed buckets with
+    log-scaled counts. Similarity is lexical, not semantic.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in features),
+                dtype=np.uint32,
+                count=len(features)
+            )
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+
+        np.copyto(vectors, np.sign(vectors) * np.log1p(np.abs(vectors)))
+        return normalize(vectors)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        if len(texts) < HASHING_THREAD_MIN_BATCH:
+            return self._embed(texts)
+        return await asyncio.to_thread(self._embed, texts)
+
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI embeddings API, through the shared provider client"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.name = "openai-" + re.sub(r"[^\w.-]", "_", model)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        client = provider_clients.openai_client
+        if not client:
+            raise ValueError("OpenAI API key not configured")
+
+        response = await client.embeddings.create(model=self.model, input=texts)
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        self.dim = vectors.shape[1]
+        return normalize(vectors)
+
+
+EMBEDDERS = {
+    "hashing": lambda: HashingEmbedder(settings.retrieval_hashing_dim),
+    "openai": lambda: OpenAIEmbedder(settings.retrieval_embedding_model),
+}
+
+
+@lru_cache()
+def get_embedder() -> Embedder:
+    """The configured embedder (RETRIEVAL_EMBEDDER)"""
+    try:
+        return EMBEDDERS[settings.retrieval_embedder]()
+    except KeyError:
+        raise ValueError(f"Unknown embedder: {settings.retrieval_embedder}")
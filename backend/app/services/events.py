@@ -0,0 +1,47 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+import asyncio
+
+# Undelivered notifications kept per subscriber before the oldest is dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class UserEvents:
+    """Per-user notification fan-out (chat titles and other out-of-band updates)
+
+    Every open connection of a user gets its own bounded queue. Events are
+    best-effort and in-process; clients that miss one catch up through
+    /sync, where the same change is recorded.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, user_id: str, data: dict):
+        for queue in self.subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    @contextmanager
+    def subscription(self, user_id: str) -> Iterator[asyncio.Queue]:
+        """Queue receiving the user's events while the block is open"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers[user_id].discard(queue)
+            if not self.subscribers[user_id]:
+                del self.subscribers[user_id]
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.subscribers),
+            "connections": sum(len(queues) for queues in self.subscribers.values())
+        }
+
+
+# Shared instance for this worker process
+user_events = UserEvents()
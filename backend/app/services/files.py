@@ -0,0 +1,157 @@
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+import asyncio
+import hashlib
+import os
+import time
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Partial uploads older than this are left over from a crash
+PARTIAL_UPLOAD_MAX_AGE = 24 * 3600
+
+
+class FileTooLarge(Exception):
+    """Raised while streaming an upload once it exceeds the size limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File exceeds {limit} bytes")
+        self.limit = limit
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised for a well-formed Range that lies outside the file"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Inclusive (start, end) of a single "bytes=" range, or None for the whole file
+
+    Malformed and multi-range headers are ignored (the whole file is
+    sent, as RFC 9110 allows).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _write_block(handle, digest, block: bytearray):
+    digest.update(block)
+    handle.write(block)
+
+
+def _commit_blob(partial: Path, blob: Path):
+    """Move a finished upload into place, or drop it if the blob already exists"""
+    if blob.exists():
+        partial.unlink()
+        return
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    # Atomic; concurrent uploads of the same bytes just replace identical content
+    os.replace(partial, blob)
+
+
+class FileService:
+    """Content-addressed attachment storage under UPLOAD_DIR
+
+    Uploads are streamed to a partial file while being hashed, then
+    renamed to blobs/<sha256[:2]>/<sha256>, so identical content is
+    stored once. Disk I/O runs in worker threads in blocks of
+    UPLOAD_CHUNK_SIZE bytes.
+    """
+
+    @staticmethod
+    def blob_path(sha256: str) -> Path:
+        return Path(settings.upload_dir) / "blobs" / sha256[:2] / sha256
+
+    @staticmethod
+    def _partial_dir() -> Path:
+        return Path(settings.upload_dir) / "tmp"
+
+    @staticmethod
+    async def store(chunks: AsyncIterator[bytes], max_size: int) -> tuple[str, int]:
+        """Write a byte stream to the blob store; returns (sha256, size)
+
+        Raises FileTooLarge as soon as more than max_size bytes arrive.
+        """
+        partial_dir = FileService._partial_dir()
+        await asyncio.to_thread(partial_dir.mkdir, parents=True, exist_ok=True)
+        partial = partial_dir / f"{uuid4()}.part"
+
+        digest = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        handle = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge(max_size)
+                buffer += chunk
+                if len(buffer) >= settings.upload_chunk_size:
+                    block, buffer = buffer, bytearray()
+                    await asyncio.to_thread(_write_block, handle, digest, block)
+            if buffer:
+                await asyncio.to_thread(_write_block, handle, digest, buffer)
+            await asyncio.to_thread(handle.close)
+
+            sha256 = digest.hexdigest()
+            await asyncio.to_thread(_commit_blob, partial, FileService.blob_path(sha256))
+            return sha256, size
+        except BaseException:
+            # Also covers client disconnects (cancellation) mid-upload
+            handle.close()
+            partial.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    async def iter_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes start..end (inclusive) of a file, reading in worker threads"""
+        handle = await asyncio.to_thread(open, path, "rb")
+        try:
+            await asyncio.to_thread(handle.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = await asyncio.to_thread(handle.read, min(settings.upload_chunk_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+        finally:
+            handle.close()
+
+    @staticmethod
+    def clean_partial_uploads() -> int:
+        """Delete partial uploads abandoned by a crash; returns how many"""
+        partial_dir = FileService._partial_dir()
+        if not partial_dir.is_dir():
+            return 0
+        cutoff = time.time() - PARTIAL_UPLOAD_MAX_AGE
+        removed = 0
+        for partial in partial_dir.glob("*.part"):
+            try:
+                if partial.stat().st_mtime < cutoff:
+                    partial.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
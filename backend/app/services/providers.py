@@ -0,0 +1,146 @@
+from typing import Dict, Optional
+import httpx
+from openai import AsyncOpenAI
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def _http2_available() -> bool:
+    """Check whether the optional h2 package is installed"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ProviderClients:
+    """Process-wide pooled HTTP clients for every AI provider
+
+    Created once in the application lifespan and shared by every
+    AIService, so streams reuse keep-alive connections instead of
+    paying a new TCP/TLS handshake per generation.
+    """
+
+    def __init__(self):
+        self.openai_client: Optional[AsyncOpenAI] = None
+        self.gemini_client: Optional[AsyncOpenAI] = None
+        self.ollama_client: Optional[httpx.AsyncClient] = None
+        self.ollama_clients: Dict[str, httpx.AsyncClient] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    def _build_http_client(
+        self,
+        max_connections: int,
+        max_keepalive: int,
+        base_url: str = ""
+    ) -> httpx.AsyncClient:
+        """Build an httpx client with its own sized connection pool"""
+        http2 = settings.provider_http2 and _http2_available()
+        if settings.provider_http2 and not http2:
+            print("HTTP/2 requested but 'h2' is not installed; falling back to HTTP/1.1")
+
+        return httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            timeout=httpx.Timeout(
+                settings.provider_timeout,
+                connect=settings.provider_connect_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=settings.provider_keepalive_expiry
+            )
+        )
+
+    async def start(self):
+        """Create the shared clients and optionally warm up their pools"""
+        if self._started:
+            return
+
+        if settings.openai_api_key:
+            http_client = self._build_http_client(
+                settings.openai_max_connections,
+                settings.openai_max_keepalive
+            )
+            self._http_clients["openai"] = http_client
+            self.openai_client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=http_client
+            )
+
+        if settings.gemini_api_key:
+            http_client = self._build_http_client(
+                settings.gemini_max_connections,
+                settings.gemini_max_keepalive
+            )
+            self._http_clients["gemini"] = http_client
+            self.gemini_client = AsyncOpenAI(
+                api_key=settings.gemini_api_key,
+                base_url=settings.gemini_base_url,
+                http_client=http_client
+            )
+
+        # One pool per Ollama host; the first one doubles as the default client
+        for url in settings.ollama_endpoints or [settings.ollama_base_url]:
+            self.ollama_for(url)
+        self.ollama_client = next(iter(self.ollama_clients.values()))
+
+        self._started = True
+
+        if settings.provider_warmup:
+            await self.warmup()
+
+    def ollama_for(self, url: str) -> httpx.AsyncClient:
+        """Get (or lazily create) the pooled client for one Ollama host"""
+        client = self.ollama_clients.get(url)
+        if client is None:
+            client = self._build_http_client(
+                settings.ollama_max_connections,
+                settings.ollama_max_keepalive,
+                base_url=url
+            )
+            self.ollama_clients[url] = client
+            self._http_clients[f"ollama@{url}"] = client
+        return client
+
+    async def warmup(self):
+        """Open a first connection to each configured provider"""
+        targets = {
+            "openai": str(self.openai_client.base_url) if self.openai_client else None,
+            "gemini": str(self.gemini_client.base_url) if self.gemini_client else None,
+        }
+        targets.update({f"ollama@{url}": "/api/tags" for url in self.ollama_clients})
+
+        for name, url in targets.items():
+            client = self._http_clients.get(name)
+            if client is None or url is None:
+                continue
+            try:
+                await client.get(url, timeout=settings.provider_connect_timeout)
+                print(f"Provider warm-up ok: {name}")
+            except httpx.HTTPError as e:
+                print(f"Provider warm-up failed: {name} ({e.__class__.__name__})")
+
+    async def close(self):
+        """Close every pooled connection"""
+        for client in self._http_clients.values():
+            await client.aclose()
+
+        self._http_clients.clear()
+        self.openai_client = None
+        self.gemini_client = None
+        self.ollama_client = None
+        self.ollama_clients.clear()
+        self._started = False
+
+
+# Shared instance, started and closed by the application lifespan
+provider_clients = ProviderClients()
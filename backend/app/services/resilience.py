@@ -0,0 +1,231 @@
+from typing import AsyncGenerator, Callable, Dict, Optional
+import asyncio
+import time
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# (provider, model)
+Target = tuple[str, str]
+StreamFactory = Callable[[str, str], AsyncGenerator[str, None]]
+
+
+class CircuitOpen(Exception):
+    """Raised when a provider's breaker is open and there is nothing to fail over to"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one provider
+
+    Opens after CIRCUIT_FAILURE_THRESHOLD failures in a row, rejects calls
+    for CIRCUIT_RESET_SECONDS, then lets a single trial call through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= settings.circuit_reset_seconds:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through, without claiming the trial"""
+        state = self.state
+        if state == "closed":
+            return True
+        # One trial at a time; a trial that never reported back expires
+        return state == "half_open" and (
+            self.trial_started_at is None
+            or time.monotonic() - self.trial_started_at >= settings.circuit_reset_seconds
+        )
+
+    def allow(self) -> bool:
+        """Claim a call to this provider now (the trial slot when half-open)"""
+        if not self.available():
+            return False
+        if self.opened_at is not None:
+            self.trial_started_at = time.monotonic()
+        return True
+
+    def release_trial(self, started_at: Optional[float]):
+        """Give back the trial claimed at started_at by a call abandoned without an outcome"""
+        if started_at is not None and self.trial_started_at == started_at:
+            self.trial_started_at = None
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_started_at = None
+        if self.opened_at is not None or self.failures >= settings.circuit_failure_threshold:
+            if self.opened_at is None:
+                print(f"Circuit opened for provider: {self.name}")
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+class ResiliencePolicy:
+    """Hedging, failover and circuit breaking across provider targets
+
+    The secondary target for a request comes from PROVIDER_FALLBACKS
+    ("provider:model" or "provider" -> "provider:model"). If the primary's
+    breaker is open the secondary is used directly; if the primary fails
+    before its first token the secondary is tried; if the first token has
+    not arrived within HEDGE_DELAY_MS a hedged request is sent to the
+    secondary and whichever answers first is kept.
+    """
+
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self.breakers.get(provider)
+        if breaker is None:
+            breaker = self.breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+    @staticmethod
+    def secondary_for(provider: str, model: str) -> Optional[Target]:
+        fallbacks = settings.provider_fallbacks
+        target = fallbacks.get(f"{provider}:{model}") or fallbacks.get(provider)
+        if not target:
+            return None
+        fallback_provider, _, fallback_model = target.partition(":")
+        return fallback_provider, fallback_model or model
+
+    async def stream(
+        self,
+        open_stream: StreamFactory,
+        primary: Target,
+        on_target: Optional[Callable[[Target], None]] = None
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the best available target"""
+        secondary = self.secondary_for(*primary)
+        candidates = [primary] + ([secondary] if secondary and secondary != primary else [])
+        # Breakers are only claimed (allow()) for targets actually launched
+        allowed = [target for target in candidates if self.breaker(target[0]).available()]
+
+        if not allowed:
+            raise CircuitOpen(f"Provider unavailable (circuit open): {primary[0]}")
+        if allowed[0] != primary:
+            self.failovers += 1
+
+        winner, generator, first = await self._first_token(open_stream, allowed)
+        if on_target is not None:
+            on_target(winner)
+
+        breaker = self.breaker(winner[0])
+        try:
+            if first is not None:
+                yield first
+            async for chunk in generator:
+                yield chunk
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            await generator.aclose()
+
+        breaker.record_success()
+
+    async def _first_token(self, open_stream: StreamFactory, targets: list[Target]):
+        """Race targets for the first token, hedging to the next one after the deadline"""
+        pending: Dict[asyncio.Task, tuple] = {}
+        queue = list(targets)
+        last_error: Optional[BaseException] = None
+        hedged = False
+
+        def launch() -> bool:
+            """Start the next target its breaker admits; False when none is left"""
+            while queue:
+                target = queue.pop(0)
+                breaker = self.breaker(target[0])
+                if not breaker.allow():
+                    continue
+                generator = open_stream(*target)
+                task = asyncio.ensure_future(generator.__anext__())
+                # The trial slot claimed, if any, so a cancelled loser can give it back
+                pending[task] = (target, generator, breaker.trial_started_at)
+                return True
+            return False
+
+        if not launch():
+            raise CircuitOpen(f"Provider unavailable (circuit open): {targets[0][0]}")
+        try:
+            while pending:
+                hedge = settings.hedge_enabled and bool(queue)
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=settings.hedge_delay_ms / 1000 if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # First token is late: hedge to the next target
+                    if launch():
+                        self.hedges += 1
+                        hedged = True
+                    continue
+
+                for task in done:
+                    target, generator, _ = pending.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        first = None
+                    except Exception as e:
+                        last_error = e
+                        self.breaker(target[0]).record_failure()
+                        continue
+
+                    if hedged and target != targets[0]:
+                        self.hedge_wins += 1
+                    return target, generator, first
+
+                # Every running target failed before its first token: fail over
+                if not pending and queue and launch():
+                    self.failovers += 1
+
+            raise last_error or CircuitOpen("No provider produced a response")
+        finally:
+            # Cancel the losers and let their generators clean up; a loser
+            # holding a half-open trial frees it, or its provider stays
+            # blocked until the trial expires
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for target, generator, trial in pending.values():
+                self.breaker(target[0]).release_trial(trial)
+                try:
+                    await generator.aclose()
+                except Exception:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+        }
+
+
+# Shared instance for this worker process
+resilience_policy = ResiliencePolicy()
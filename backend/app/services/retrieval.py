@@ -0,0 +1,296 @@
+from pathlib import Path
+from typing import Optional, Sequence
+import asyncio
+import mimetypes
+import time
+
+import numpy as np
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.metrics import retrieval_duration
+from app.models.file import File as FileModel, FileChunk
+from app.models.message import Message as MessageModel
+from app.services.embeddings import get_embedder
+from app.services.files import FileService
+from app.services.vector_index import vector_store
+
+try:
+    import pypdf
+except ImportError:  # optional dependency, needed for PDF attachments
+    pypdf = None
+
+settings = get_settings()
+
+PDF_TYPE = "application/pdf"
+TEXT_TYPES = ("text/", "application/json", "application/xml", "application/x-yaml")
+
+# Chunks embedded per embedder call during ingestion
+EMBED_BATCH_SIZE = 256
+
+CONTEXT_PROMPT = (
+    "Excerpts from files attached to this conversation are below. Use them when "
+    "they are relevant and cite them by their [number]."
+)
+
+
+def _content_type(content_type: str, name: str) -> str:
+    if content_type in ("", "application/octet-stream"):
+        return mimetypes.guess_type(name)[0] or content_type
+    return content_type
+
+
+def is_ingestible(content_type: str, name: str) -> bool:
+    """Whether a file is text or PDF (and so can be chunked and retrieved)"""
+    content_type = _content_type(content_type, name)
+    return content_type == PDF_TYPE or content_type.startswith(TEXT_TYPES)
+
+
+def chunk_text(text: str, size: int, overlap: int) -> list[str]:
+    """Split text into ~size-character passages, preferring paragraph/line/word breaks"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            floor = start + size // 2
+            for separator in ("\n\n", "\n", ". ", " "):
+                cut = text.rfind(separator, floor, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(piece)
+        if end >= len(text):
+            break
+        next_start = max(end - overlap, start + 1)
+        if overlap:
+            # Overlap from a word boundary, not mid-word
+            boundary = text.find(" ", next_start, end)
+            if boundary != -1:
+                next_start = boundary + 1
+        start = next_start
+    return chunks
+
+
+def extract_chunks(path: Path, content_type: str) -> list[tuple[str, Optional[int]]]:
+    """(text, page) passages of a stored file; pages are 1-based for PDFs, else None"""
+    size, overlap = settings.retrieval_chunk_chars, settings.retrieval_chunk_overlap
+
+    if content_type == PDF_TYPE:
+        if pypdf is None:
+            print("PDF attachment skipped: install 'pypdf' to index PDFs")
+            return []
+        reader = pypdf.PdfReader(path)
+        return [
+            (chunk, number)
+            for number, page in enumerate(reader.pages, start=1)
+            for chunk in chunk_text(page.extract_text() or "", size, overlap)
+        ]
+
+    text = path.read_bytes().decode("utf-8-sig", errors="replace")
+    return [(chunk, None) for chunk in chunk_text(text, size, overlap)]
+
+
+class RetrievalService:
+    """Retrieval over text/PDF attachments
+
+    Each stored blob is chunked once (file_chunks, shared by every upload
+    of the same content) and embedded once per embedder into the on-disk
+    vector store. Generation retrieves the best chunks from the files
+    attached along the conversation branch.
+    """
+
+    @staticmethod
+    def schedule_ingest(file: FileModel):
+        """Index a new upload off the request path"""
+        if not settings.retrieval_enabled or not is_ingestible(file.content_type, file.name):
+            return
+        task = asyncio.create_task(
+            RetrievalService.ingest(file.sha256, _content_type(file.content_type, file.name))
+        )
+        _ingest_tasks.add(task)
+        task.add_done_callback(_ingest_tasks.discard)
+
+    @staticmethod
+    async def ingest(sha256: str, content_type: str, timeout: Optional[float] = None) -> bool:
+        """Chunk and embed a blob unless already indexed; True when indexed
+
+        Concurrent calls for the same blob share one ingestion. With a
+        timeout, False is returned if it has not finished by then (it
+        keeps running in the background).
+        """
+        embedder = get_embedder()
+        if vector_store.has(embedder.name, sha256):
+            return True
+
+        key = (embedder.name, sha256)
+        task = _pending_ingests.get(key)
+        if task is None:
+            task = asyncio.create_task(RetrievalService._ingest(sha256, content_type))
+            _pending_ingests[key] = task
+            task.add_done_callback(lambda _: _pending_ingests.pop(key, None))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    @staticmethod
+    async def _ingest(sha256: str, content_type: str) -> bool:
+        embedder = get_embedder()
+        try:
+            async with AsyncSessionLocal() as session:
+                texts = await RetrievalService._chunk_texts(session, sha256)
+                if texts is None:
+                    try:
+                        passages = await asyncio.to_thread(
+                            extract_chunks, FileService.blob_path(sha256), content_type
+                        )
+                    except Exception as e:
+                        # Unreadable content fails the same way every time
+                        print(f"Error parsing attachment {sha256}: {str(e)}")
+                        passages = []
+                    session.add_all([
+                        FileChunk(sha256=sha256, ordinal=ordinal, page=page, text=text)
+                        for ordinal, (text, page) in enumerate(passages)
+                    ])
+                    try:
+                        await session.commit()
+                    except IntegrityError:
+                        # Another worker chunked the same blob first
+                        await session.rollback()
+                    texts = await RetrievalService._chunk_texts(session, sha256) or []
+
+            if not texts:
+                # Record that there is nothing to embed rather than parse it on
+                # every generation (PDFs are retried once pypdf is installed)
+                if content_type != PDF_TYPE or pypdf is not None:
+                    await asyncio.to_thread(vector_store.mark_empty, embedder.name, sha256)
+                return False
+
+            batches = [
+                await embedder.embed(texts[start:start + EMBED_BATCH_SIZE])
+                for start in range(0, len(texts), EMBED_BATCH_SIZE)
+            ]
+            await asyncio.to_thread(vector_store.write, embedder.name, sha256, np.concatenate(batches))
+            return True
+        except Exception as e:
+            print(f"Error indexing attachment {sha256}: {str(e)}")
+            return False
+
+    @staticmethod
+    async def _chunk_texts(session: AsyncSession, sha256: str) -> Optional[list[str]]:
+        result = await session.execute(
+            select(FileChunk.text)
+            .where(FileChunk.sha256 == sha256)
+            .order_by(FileChunk.ordinal)
+        )
+        return result.scalars().all() or None
+
+    @staticmethod
+    async def retrieve(
+        db: AsyncSession,
+        user_id: str,
+        message_ids: Sequence[str],
+        query: str
+    ) -> list[dict]:
+        """Top chunks for query from the user's files attached to message_ids
+
+        Returns citations (file_id, name, chunk, page, score, text), best
+        first. Attachments still being ingested are waited for up to
+        RETRIEVAL_INGEST_WAIT_SECONDS, then left out.
+        """
+        if not settings.retrieval_enabled or not message_ids or not query.strip():
+            return []
+
+        result = await db.execute(
+            select(MessageModel.files).where(MessageModel.id.in_(list(message_ids)))
+        )
+        file_ids = {
+            item["id"]
+            for files in result.scalars()
+            for item in files or []
+            if isinstance(item, dict) and item.get("id")
+        }
+        if not file_ids:
+            return []
+
+        result = await db.execute(
+            select(FileModel)
+            .where(FileModel.id.in_(file_ids) & (FileModel.user_id == user_id))
+            .order_by(FileModel.created_at)
+        )
+        files_by_sha: dict[str, FileModel] = {}
+        for file in result.scalars():
+            if is_ingestible(file.content_type, file.name):
+                files_by_sha.setdefault(file.sha256, file)
+        if not files_by_sha:
+            return []
+
+        ready = await asyncio.gather(*(
+            RetrievalService.ingest(
+                sha256, _content_type(file.content_type, file.name), settings.retrieval_ingest_wait_seconds
+            )
+            for sha256, file in files_by_sha.items()
+        ))
+        sha256s = [sha256 for sha256, ok in zip(files_by_sha, ready) if ok]
+        if not sha256s:
+            return []
+
+        started = time.perf_counter()
+        embedder = get_embedder()
+        query_vector = (await embedder.embed([query]))[0]
+        hits = [
+            hit for hit in await asyncio.to_thread(
+                vector_store.search, embedder.name, sha256s, query_vector, settings.retrieval_top_k
+            )
+            if hit[0] >= settings.retrieval_min_score
+        ]
+        retrieval_duration.observe(time.perf_counter() - started)
+        if not hits:
+            return []
+
+        result = await db.execute(
+            select(FileChunk).where(
+                tuple_(FileChunk.sha256, FileChunk.ordinal).in_([(sha, ordinal) for _, sha, ordinal in hits])
+            )
+        )
+        chunks = {(chunk.sha256, chunk.ordinal): chunk for chunk in result.scalars()}
+
+        citations = []
+        for score, sha256, ordinal in hits:
+            chunk = chunks.get((sha256, ordinal))
+            if chunk is None:
+                continue
+            file = files_by_sha[sha256]
+            citations.append({
+                "file_id": file.id,
+                "name": file.name,
+                "chunk": ordinal,
+                "page": chunk.page,
+                "score": round(score, 4),
+                "text": chunk.text
+            })
+        return citations
+
+    @staticmethod
+    def context_message(citations: list[dict]) -> Optional[dict]:
+        """System message presenting citations as numbered excerpts"""
+        if not citations:
+            return None
+        excerpts = []
+        for number, citation in enumerate(citations, start=1):
+            source = citation["name"]
+            if citation["page"]:
+                source += f", page {citation['page']}"
+            excerpts.append(f"[{number}] {source}\n{citation['text']}")
+        return {"role": "system", "content": CONTEXT_PROMPT + "\n\n" + "\n\n".join(excerpts)}
+
+
+# Keep references so background ingestion tasks are not garbage collected
+_ingest_tasks: set = set()
+_pending_ingests: dict = {}
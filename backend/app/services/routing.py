@@ -0,0 +1,193 @@
+from contextlib import asynccontextmanager
+from fnmatch import fnmatchcase
+from typing import AsyncGenerator, Dict, Optional
+import random
+import time
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Model name patterns per provider, used when MODEL_ROUTES has no match
+# (substring matches, checked in order: "codellama" and "chatgpt-4o" route too)
+DEFAULT_ROUTES = {
+    "*gpt*": "openai",
+    "*openai*": "openai",
+    "o1*": "openai",
+    "*gemini*": "gemini",
+    "*llama*": "ollama",
+    "*mistral*": "ollama",
+    "*qwen*": "ollama",
+}
+
+# Assumed TTFT of unmeasured endpoints while no peer has a measurement either
+COLD_TTFT_SECONDS = 1.0
+
+
+class Endpoint:
+    """One upstream serving a provider, with live latency and load figures"""
+
+    def __init__(self, provider: str, url: Optional[str] = None):
+        self.provider = provider
+        self.url = url
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.ejected_until = 0.0
+        self.ttft_ewma: Optional[float] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}@{self.url}" if self.url else self.provider
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def score(self, cold_ttft: float) -> float:
+        """Expected wait: moving-average TTFT scaled by current load and recent failures
+
+        Endpoints without a measurement yet use cold_ttft (the best TTFT
+        among their peers), so they get probed without being flooded; a
+        host that fails before its first token never gets a measurement
+        but still falls behind through its failures.
+        """
+        ttft = self.ttft_ewma if self.ttft_ewma is not None else cold_ttft
+        # Floor so load and failures still count against near-instant hosts
+        return max(ttft, 0.001) * (self.in_flight + 1) * (1 + self.consecutive_errors)
+
+    def observe_ttft(self, seconds: float):
+        alpha = settings.routing_ewma_alpha
+        self.consecutive_errors = 0
+        if self.ttft_ewma is None:
+            self.ttft_ewma = seconds
+        else:
+            self.ttft_ewma = alpha * seconds + (1 - alpha) * self.ttft_ewma
+
+    def record_failure(self):
+        """Count a failed request; eject after ROUTING_EJECT_FAILURES in a row"""
+        self.errors += 1
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= settings.routing_eject_failures:
+            self.ejected_until = time.monotonic() + settings.routing_eject_seconds
+            print(f"Endpoint ejected after {self.consecutive_errors} failures: {self.key}")
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejected": self.ejected,
+            "ttft_ms": round(self.ttft_ewma * 1000, 1) if self.ttft_ewma is not None else None,
+        }
+
+
+class RequestTracker:
+    """Per-request handle that records the endpoint's time to first token"""
+
+    def __init__(self, endpoint: Endpoint):
+        self.endpoint = endpoint
+        self.started_at = time.monotonic()
+        self.first_token = False
+
+    def token(self):
+        if not self.first_token:
+            self.first_token = True
+            self.endpoint.observe_ttft(time.monotonic() - self.started_at)
+
+
+class ModelRouter:
+    """Maps models to providers and spreads load over each provider's endpoints
+
+    The provider comes from MODEL_ROUTES (exact names, then fnmatch
+    patterns), then the built-in patterns, then DEFAULT_AI_PROVIDER.
+    Ollama may be served by several hosts (OLLAMA_ENDPOINTS, optionally
+    narrowed per model by MODEL_ENDPOINTS); each request goes to the
+    endpoint with the lowest moving-average TTFT × (in-flight + 1),
+    penalised per consecutive failure. Endpoints failing
+    ROUTING_EJECT_FAILURES times in a row are skipped for
+    ROUTING_EJECT_SECONDS, then probed again.
+    """
+
+    def __init__(self):
+        self.endpoints: Dict[str, Endpoint] = {}
+
+    @staticmethod
+    def default_model(provider: str) -> str:
+        if provider == "openai":
+            return settings.openai_model
+        if provider == "gemini":
+            return settings.gemini_model
+        return settings.ollama_model
+
+    @staticmethod
+    def provider_for(model: str) -> str:
+        routes = settings.model_routes
+        if model in routes:
+            return routes[model]
+
+        name = model.lower()
+        for table in (routes, DEFAULT_ROUTES):
+            for pattern, provider in table.items():
+                if fnmatchcase(name, pattern.lower()):
+                    return provider
+
+        return settings.default_ai_provider
+
+    def resolve(self, model: Optional[str] = None, provider: Optional[str] = None) -> tuple[str, str]:
+        """Fill in whichever of (provider, model) is missing"""
+        if not model:
+            provider = provider or settings.default_ai_provider
+            return provider, self.default_model(provider)
+        return provider or self.provider_for(model), model
+
+    @staticmethod
+    def urls_for(provider: str, model: str) -> list[Optional[str]]:
+        """Upstream base URLs able to serve model (None = the provider's own client)"""
+        if provider != "ollama":
+            return [None]
+        return (
+            settings.model_endpoints.get(model)
+            or settings.ollama_endpoints
+            or [settings.ollama_base_url]
+        )
+
+    def endpoint(self, provider: str, url: Optional[str] = None) -> Endpoint:
+        key = f"{provider}@{url}" if url else provider
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            endpoint = self.endpoints[key] = Endpoint(provider, url)
+        return endpoint
+
+    def pick(self, provider: str, model: str) -> Endpoint:
+        """Choose the least-loaded, fastest endpoint for a request"""
+        candidates = [self.endpoint(provider, url) for url in self.urls_for(provider, model)]
+        # With every endpoint ejected, keep trying rather than fail outright
+        candidates = [e for e in candidates if not e.ejected] or candidates
+        measured = [e.ttft_ewma for e in candidates if e.ttft_ewma is not None]
+        cold_ttft = min(measured) if measured else COLD_TTFT_SECONDS
+        # Shuffle first so ties (e.g. cold endpoints) are broken randomly
+        random.shuffle(candidates)
+        return min(candidates, key=lambda e: e.score(cold_ttft))
+
+    @asynccontextmanager
+    async def track(self, endpoint: Endpoint) -> AsyncGenerator[RequestTracker, None]:
+        """Count a request against endpoint while it runs"""
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+        tracker = RequestTracker(endpoint)
+        try:
+            yield tracker
+        except Exception:
+            endpoint.record_failure()
+            raise
+        finally:
+            endpoint.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {key: endpoint.stats() for key, endpoint in self.endpoints.items()}
+
+
+# Shared instance for this worker process
+model_router = ModelRouter()
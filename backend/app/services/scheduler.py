@@ -0,0 +1,223 @@
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+import asyncio
+import itertools
+import math
+import time
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class SchedulerBusy(Exception):
+    """Raised when a generation cannot be queued; carries a Retry-After hint"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many pending generations")
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """Raised when a queued generation waited longer than the queue timeout"""
+
+
+class Ticket:
+    """A generation's place in a lane
+
+    acquire() waits (reporting queue position) until a slot is granted;
+    release() frees it. Unused tickets must be released too.
+    """
+
+    def __init__(self, lane: "Lane", user_id: str, finish_tag: float, seq: int):
+        self.lane = lane
+        self.user_id = user_id
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.granted = False
+        self.released = False
+        self.changed = asyncio.Event()
+        self.started_at: Optional[float] = None
+
+    @property
+    def position(self) -> int:
+        """1-based position among waiting tickets (0 once granted)"""
+        if self.granted:
+            return 0
+        return 1 + sum(1 for other in self.lane.waiting if other.sort_key < self.sort_key)
+
+    @property
+    def sort_key(self) -> tuple:
+        return (self.finish_tag, self.seq)
+
+    async def acquire(
+        self,
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+        timeout: Optional[float] = None
+    ):
+        """Wait for a slot, calling on_position whenever the position changes"""
+        timeout = settings.scheduler_queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        reported = None
+
+        while not self.granted:
+            position = self.position
+            if on_position is not None and position != reported:
+                await on_position(position)
+                reported = position
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.release()
+                raise QueueTimeout("Timed out waiting for a free generation slot")
+
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                continue
+
+        self.started_at = time.monotonic()
+
+    def release(self):
+        """Give the slot (or queue place) back"""
+        if self.released:
+            return
+        self.released = True
+        self.lane.release(self)
+
+
+class Lane:
+    """Concurrency-limited queue for one provider (or provider:model)
+
+    Waiting tickets are ordered by weighted fair queueing: each user's
+    next finish tag is max(virtual clock, user's last tag) + 1/weight, so
+    a burst from one user interleaves with everyone else's requests.
+    """
+
+    def __init__(self, key: str, limit: int):
+        self.key = key
+        self.limit = limit
+        self.active = 0
+        self.waiting: list[Ticket] = []
+        self.virtual_clock = 0.0
+        self.user_tags: Dict[str, float] = {}
+        self.avg_service_seconds = 5.0
+        self._seq = itertools.count()
+
+    def queued_for(self, user_id: str) -> int:
+        return sum(1 for ticket in self.waiting if ticket.user_id == user_id)
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a queue place frees up"""
+        backlog = len(self.waiting) + 1
+        return max(1, math.ceil(self.avg_service_seconds * backlog / max(self.limit, 1)))
+
+    def check(self, user_id: str, count: int = 1):
+        """Raise SchedulerBusy if count new requests from user_id would have to be refused"""
+        free = max(self.limit - self.active - len(self.waiting), 0)
+        queued = count - free  # how many of them would wait
+        if queued <= 0:
+            return
+        if (
+            len(self.waiting) + queued > settings.scheduler_max_queue
+            or self.queued_for(user_id) + queued > settings.scheduler_max_queued_per_user
+        ):
+            raise SchedulerBusy(self.retry_after())
+
+    def enqueue(self, user_id: str, weight: float) -> Ticket:
+        """Queue a request; admission is decided beforehand by check()"""
+        start = max(self.virtual_clock, self.user_tags.get(user_id, 0.0))
+        finish = start + 1.0 / max(weight, 0.01)
+        self.user_tags[user_id] = finish
+
+        ticket = Ticket(self, user_id, finish, next(self._seq))
+        self.waiting.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        if ticket.granted:
+            self.active -= 1
+            if ticket.started_at is not None:
+                elapsed = time.monotonic() - ticket.started_at
+                self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * elapsed
+        elif ticket in self.waiting:
+            self.waiting.remove(ticket)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the lowest finish tags and wake all waiters"""
+        while self.waiting and self.active < self.limit:
+            ticket = min(self.waiting, key=lambda t: t.sort_key)
+            self.waiting.remove(ticket)
+            self.virtual_clock = max(self.virtual_clock, ticket.finish_tag)
+            ticket.granted = True
+            ticket.changed.set()
+            self.active += 1
+
+        for ticket in self.waiting:
+            ticket.changed.set()
+        if not self.waiting and not self.active:
+            self.user_tags.clear()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self.waiting),
+            "avg_service_seconds": round(self.avg_service_seconds, 2),
+        }
+
+
+class GenerationScheduler:
+    """Admission control in front of AIService
+
+    Concurrency is limited per provider, or per provider:model when that
+    key has its own entry in SCHEDULER_CONCURRENCY.
+    """
+
+    def __init__(self):
+        self.lanes: Dict[str, Lane] = {}
+
+    def lane(self, provider: str, model: str) -> Lane:
+        limits = settings.scheduler_concurrency
+        model_key = f"{provider}:{model}"
+        key = model_key if model_key in limits else provider
+
+        lane = self.lanes.get(key)
+        if lane is None:
+            lane = Lane(key, limits.get(key, settings.scheduler_default_concurrency))
+            self.lanes[key] = lane
+        return lane
+
+    def check(self, targets: Iterable[tuple[str, str]], user_id: str):
+        """Fast admission check for all (provider, model) generations of one request
+
+        Done before any work for the request; a fan-out is counted as a
+        whole, so it cannot exceed the per-user limits of a lane.
+        """
+        counts = Counter(self.lane(provider, model) for provider, model in targets)
+        for lane, count in counts.items():
+            lane.check(user_id, count)
+
+    def enqueue(self, provider: str, model: str, user_id: str, weight: float = 1.0) -> Ticket:
+        """Take a place in line; the slot is awaited with Ticket.acquire()"""
+        return self.lane(provider, model).enqueue(user_id, weight)
+
+    def admit(self, targets: Iterable[tuple[str, str]], user_id: str, weight: float = 1.0) -> list[Ticket]:
+        """check() and enqueue() all generations of one request together
+
+        Nothing is awaited in between, so a burst of concurrent requests
+        cannot all pass the check before any of them holds a place.
+        """
+        targets = list(targets)
+        self.check(targets, user_id)
+        return [self.enqueue(provider, model, user_id, weight) for provider, model in targets]
+
+    def stats(self) -> dict:
+        return {key: lane.stats() for key, lane in self.lanes.items()}
+
+
+# Shared instance for this worker process
+generation_scheduler = GenerationScheduler()
@@ -0,0 +1,303 @@
+from typing import Optional
+import html
+import re
+from sqlalchemy import Float, Integer, String, column, exists, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.message import Message as MessageModel
+
+settings = get_settings()
+
+# Snippet highlight sentinels, replaced by <mark> after HTML-escaping
+START, STOP = "\x02", "\x03"
+
+SQLITE = "sqlite"
+POSTGRES = "postgresql"
+
+# Words of context kept before the first match in a snippet
+SNIPPET_LEAD_WORDS = 4
+
+# SQLite: FTS5 rows are keyed by search_documents.doc_id, a stable integer
+# (messages have string ids, and their implicit rowids may change on VACUUM).
+# The FTS table is contentless: the text stays (compressed) in messages only.
+SQLITE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS search_documents ("
+    "doc_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "message_id VARCHAR NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(content, content='', tokenize='{tokenizer}')",
+]
+
+# Tables of the earlier index that kept its own copy of every message
+SQLITE_LEGACY_TABLES = ("message_fts", "search_documents")
+
+POSTGRES_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS message_search ("
+    "message_id VARCHAR PRIMARY KEY, "
+    "document TSVECTOR NOT NULL)",
+    "ALTER TABLE message_search DROP COLUMN IF EXISTS content",
+    "CREATE INDEX IF NOT EXISTS ix_message_search_document ON message_search USING GIN (document)",
+]
+
+
+def _dialect(db) -> Optional[str]:
+    """Search backend for a session/connection, or None when unsupported"""
+    if not settings.search_enabled:
+        return None
+    name = db.get_bind().dialect.name if isinstance(db, AsyncSession) else db.dialect.name
+    return name if name in (SQLITE, POSTGRES) else None
+
+
+def _fts5_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: all terms, last one as a prefix"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return ""
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _snippet(content: str, query: str) -> str:
+    """About SEARCH_SNIPPET_TOKENS words of content around the first query term, terms marked"""
+    terms = sorted(set(re.findall(r"\w+", query.lower())), key=len, reverse=True)
+    words = content.split()
+    if not terms or not words:
+        return " ".join(words[:settings.search_snippet_tokens])
+
+    pattern = re.compile("|".join(map(re.escape, terms)), re.IGNORECASE)
+    first = next((index for index, word in enumerate(words) if pattern.search(word)), 0)
+    start = max(first - SNIPPET_LEAD_WORDS, 0)
+    end = start + settings.search_snippet_tokens
+
+    snippet = pattern.sub(lambda match: START + match.group(0) + STOP, " ".join(words[start:end]))
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(words) else "")
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escape a snippet and turn the sentinels into <mark> tags"""
+    return html.escape(snippet or "").replace(START, "<mark>").replace(STOP, "</mark>")
+
+
+class SearchService:
+    """Full-text search over message content
+
+    SQLite uses a contentless FTS5 table, PostgreSQL a tsvector column
+    with a GIN index; neither keeps a copy of the text, and snippets are
+    cut from the (decompressed) message. Documents are written by the
+    application in the same transaction as the message (content may be
+    stored compressed, so database triggers could not read it).
+    """
+
+    @staticmethod
+    def supported(db) -> bool:
+        return _dialect(db) is not None
+
+    @staticmethod
+    async def index_message(db: AsyncSession, message_id: str, content: str):
+        """Add or replace a message's document in the caller's transaction
+
+        Call before the new content is written: on SQLite the old document
+        is removed using the text still stored in the message row.
+        """
+        dialect = _dialect(db)
+        if dialect == SQLITE:
+            doc_id = await db.scalar(
+                text("SELECT doc_id FROM search_documents WHERE message_id = :id"),
+                {"id": message_id}
+            )
+            if doc_id is None:
+                await db.execute(
+                    text("INSERT INTO search_documents (message_id) VALUES (:id)"), {"id": message_id}
+                )
+                doc_id = await db.scalar(
+                    text("SELECT doc_id FROM search_documents WHERE message_id = :id"),
+                    {"id": message_id}
+                )
+            else:
+                # A contentless FTS5 row is deleted by passing back the text it indexed
+                previous = await db.scalar(select(MessageModel.content).where(MessageModel.id == message_id))
+                await db.execute(
+                    text("INSERT INTO message_fts (message_fts, rowid, content) VALUES ('delete', :doc, :content)"),
+                    {"doc": doc_id, "content": previous or ""}
+                )
+            await db.execute(
+                text("INSERT INTO message_fts (rowid, content) VALUES (:doc, :content)"),
+                {"doc": doc_id, "content": content}
+            )
+        elif dialect == POSTGRES:
+            await db.execute(
+                text("INSERT INTO message_search (message_id, document) "
+                     "VALUES (:id, to_tsvector(CAST(:config AS regconfig), :content)) "
+                     "ON CONFLICT (message_id) DO UPDATE SET document = EXCLUDED.document"),
+                {"id": message_id, "content": content, "config": settings.search_postgres_config}
+            )
+
+    @staticmethod
+    async def remove_chat(db: AsyncSession, chat_id: str):
+        """Drop the documents of a chat's messages (call before deleting them)"""
+        dialect = _dialect(db)
+        if dialect == SQLITE:
+            result = await db.execute(
+                text("SELECT d.doc_id, m.content FROM search_documents d "
+                     "JOIN messages m ON m.id = d.message_id WHERE m.chat_id = :chat_id")
+                .columns(doc_id=Integer, content=MessageModel.content.type),
+                {"chat_id": chat_id}
+            )
+            documents = [{"doc": row.doc_id, "content": row.content or ""} for row in result]
+            if documents:
+                await db.execute(
+                    text("INSERT INTO message_fts (message_fts, rowid, content) VALUES ('delete', :doc, :content)"),
+                    documents
+                )
+                await db.execute(
+                    text("DELETE FROM search_documents WHERE doc_id = :doc"),
+                    [{"doc": document["doc"]} for document in documents]
+                )
+        elif dialect == POSTGRES:
+            await db.execute(
+                text("DELETE FROM message_search WHERE message_id IN "
+                     "(SELECT id FROM messages WHERE chat_id = :chat_id)"),
+                {"chat_id": chat_id}
+            )
+
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        user_id: str,
+        query: str,
+        limit: int,
+        chat_id: Optional[str] = None
+    ) -> list[dict]:
+        """Ranked matches within the user's chats, best first, with highlighted snippets
+
+        Raises ValueError when the database has no search index.
+        """
+        dialect = _dialect(db)
+        params = {"user_id": user_id, "limit": limit, "chat_id": chat_id}
+        chat_filter = "AND m.chat_id = :chat_id " if chat_id else ""
+
+        if dialect == SQLITE:
+            params["query"] = _fts5_query(query)
+            if not params["query"]:
+                return []
+            statement = text(
+                "SELECT m.id AS message_id, m.chat_id, c.title AS chat_title, m.role, m.timestamp, "
+                "m.content, -message_fts.rank AS score "
+                "FROM message_fts "
+                "JOIN search_documents d ON d.doc_id = message_fts.rowid "
+                "JOIN messages m ON m.id = d.message_id "
+                "JOIN chats c ON c.id = m.chat_id "
+                f"WHERE message_fts MATCH :query AND c.user_id = :user_id {chat_filter}"
+                "ORDER BY message_fts.rank LIMIT :limit"
+            )
+        elif dialect == POSTGRES:
+            params.update(query=query, config=settings.search_postgres_config)
+            statement = text(
+                "SELECT m.id AS message_id, m.chat_id, c.title AS chat_title, m.role, m.timestamp, "
+                "m.content, ts_rank(s.document, q) AS score "
+                "FROM message_search s "
+                "CROSS JOIN websearch_to_tsquery(CAST(:config AS regconfig), :query) q "
+                "JOIN messages m ON m.id = s.message_id "
+                "JOIN chats c ON c.id = m.chat_id "
+                f"WHERE s.document @@ q AND c.user_id = :user_id {chat_filter}"
+                "ORDER BY score DESC LIMIT :limit"
+            )
+        else:
+            raise ValueError("Search is not supported on this database")
+
+        result = await db.execute(
+            statement.columns(
+                message_id=String,
+                chat_id=String,
+                chat_title=String,
+                role=MessageModel.role.type,
+                timestamp=MessageModel.timestamp.type,
+                content=MessageModel.content.type,
+                score=Float
+            ),
+            params
+        )
+        return [
+            {
+                "message_id": row.message_id,
+                "chat_id": row.chat_id,
+                "chat_title": row.chat_title,
+                "role": row.role,
+                "timestamp": row.timestamp,
+                "snippet": _highlight(_snippet(row.content or "", query)),
+                "score": float(row.score)
+            }
+            for row in result
+        ]
+
+
+def backfill_search_index(conn: Connection, batch_size: int = 500):
+    """Index messages that have no search document yet
+
+    Covers existing messages when the index is first created and those
+    written while SEARCH_ENABLED was off.
+    """
+    dialect = _dialect(conn)
+    if dialect == SQLITE:
+        documents = table("search_documents", column("message_id"))
+    elif dialect == POSTGRES:
+        documents = table("message_search", column("message_id"))
+    else:
+        return
+
+    messages = MessageModel.__table__
+    missing = ~exists().where(documents.c.message_id == messages.c.id)
+    last_id = ""
+
+    while True:
+        rows = conn.execute(
+            select(messages.c.id, messages.c.content)
+            .where(missing & (messages.c.id > last_id))
+            .order_by(messages.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+
+        if dialect == SQLITE:
+            conn.execute(
+                text("INSERT INTO search_documents (message_id) VALUES (:id) "
+                     "ON CONFLICT (message_id) DO NOTHING"),
+                [{"id": row.id} for row in rows]
+            )
+            conn.execute(
+                text("INSERT INTO message_fts (rowid, content) "
+                     "SELECT doc_id, :content FROM search_documents WHERE message_id = :id"),
+                [{"id": row.id, "content": row.content} for row in rows]
+            )
+        elif dialect == POSTGRES:
+            conn.execute(
+                text("INSERT INTO message_search (message_id, document) "
+                     "VALUES (:id, to_tsvector(CAST(:config AS regconfig), :content)) "
+                     "ON CONFLICT (message_id) DO NOTHING"),
+                [
+                    {"id": row.id, "content": row.content, "config": settings.search_postgres_config}
+                    for row in rows
+                ]
+            )
+
+
+def create_search_index(conn: Connection):
+    """Create the search tables if missing"""
+    dialect = _dialect(conn)
+    if dialect == SQLITE:
+        definition = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE name = 'message_fts'"
+        )).scalar()
+        if definition and "content=''" not in definition:
+            # Rebuilt without the copied text by the backfill that follows
+            for name in SQLITE_LEGACY_TABLES:
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        for statement in SQLITE_SCHEMA:
+            conn.execute(text(statement.format(tokenizer=settings.search_sqlite_tokenizer)))
+    elif dialect == POSTGRES:
+        for statement in POSTGRES_SCHEMA:
+            conn.execute(text(statement))
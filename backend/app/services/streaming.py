@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.chat import Chat as ChatModel
+from app.models.message import Message as MessageModel, MessageStatus
+from app.services.broker import stream_broker
+from app.services.search import SearchService
+from app.services.sync import SyncService, CHAT, MESSAGE
+
+settings = get_settings()
+
+
+class StreamPersister:
+    """Persist a streaming assistant message incrementally
+
+    Chunks are buffered in a list (joined once per write, so accumulation
+    stays linear) and checkpointed to the messages row every N chunks or
+    T milliseconds through a single reused session. finalize() performs
+    the last write; rows left STREAMING by a crashed worker are repaired
+    by recover_orphaned_streams() at startup and periodically after.
+    """
+
+    def __init__(
+        self,
+        message_id: str,
+        user_id: Optional[str] = None,
+        chat_id: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        checkpoint_tokens: Optional[int] = None,
+        checkpoint_interval_ms: Optional[int] = None
+    ):
+        self.message_id = message_id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.metadata = dict(metadata or {})
+        self.checkpoint_tokens = checkpoint_tokens or settings.stream_checkpoint_tokens
+        self.checkpoint_interval = (
+            checkpoint_interval_ms or settings.stream_checkpoint_interval_ms
+        ) / 1000
+        self.chunks: list[str] = []
+        self.finished = False
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    async def _write(self, record_change: bool = False, **values):
+        if self._session is None:
+            self._session = AsyncSessionLocal()
+
+        try:
+            if record_change and values.get("content"):
+                # Before the update: re-indexing reads the previous text
+                await SearchService.index_message(self._session, self.message_id, values["content"])
+            await self._session.execute(
+                update(MessageModel)
+                .where(MessageModel.id == self.message_id)
+                .values(**values)
+            )
+            if record_change and self.chat_id:
+                # Final write: the reply becomes the chat's latest activity
+                await self._session.execute(
+                    ChatModel.record_activity(self.chat_id, values.get("content"))
+                )
+            if record_change and self.user_id:
+                SyncService.record(
+                    self._session, self.user_id, MESSAGE, self.message_id, chat_id=self.chat_id
+                )
+                if self.chat_id:
+                    SyncService.record(
+                        self._session, self.user_id, CHAT, self.chat_id, chat_id=self.chat_id
+                    )
+            await self._session.commit()
+        except BaseException:
+            # Leave the reused session usable for the final (error) write
+            await self._session.rollback()
+            raise
+
+    async def append(self, chunk: str):
+        """Buffer a chunk and checkpoint when a threshold is reached"""
+        self.chunks.append(chunk)
+        self._pending += 1
+
+        if (
+            self._pending >= self.checkpoint_tokens
+            or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        ):
+            await self.checkpoint()
+
+    async def checkpoint(self):
+        """Write the partial content while the message keeps streaming"""
+        if not self._pending:
+            return
+
+        await self._write(
+            **MessageModel.content_fields(self.content),
+            message_metadata={
+                **self.metadata,
+                "checkpoint_at": datetime.now(timezone.utc).isoformat()
+            }
+        )
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+    async def finalize(
+        self,
+        status: MessageStatus = MessageStatus.COMPLETED,
+        content: Optional[str] = None
+    ):
+        """Write the final content and status in one statement"""
+        await self._write(
+            record_change=True,
+            **MessageModel.content_fields(self.content if content is None else content),
+            status=status,
+            message_metadata=self.metadata or None
+        )
+        self.finished = True
+
+    async def close(self):
+        """Release the reused session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+async def recover_orphaned_streams() -> int:
+    """Mark messages left STREAMING by a dead worker as ERROR
+
+    Only rows whose last checkpoint (or creation) is older than the grace
+    period are touched, so live streams of other workers are left alone;
+    generations running in this process are always skipped.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.stream_orphan_grace_seconds)
+    live = stream_broker.running_ids()
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(MessageModel, ChatModel.user_id)
+            .join(ChatModel, ChatModel.id == MessageModel.chat_id)
+            .where(MessageModel.status == MessageStatus.STREAMING)
+        )
+
+        repaired = 0
+        for message, user_id in result.all():
+            if message.id in live:
+                continue
+            last_seen = (message.message_metadata or {}).get("checkpoint_at")
+            last_seen = datetime.fromisoformat(last_seen) if last_seen else message.timestamp
+            if last_seen is not None and last_seen.tzinfo is None:
+                last_seen = last_seen.replace(tzinfo=timezone.utc)
+
+            if last_seen is None or last_seen < cutoff:
+                message.status = MessageStatus.ERROR
+                message.content = message.content or "Generation was interrupted"
+                metadata = dict(message.message_metadata or {})
+                metadata.pop("checkpoint_at", None)
+                message.message_metadata = {**metadata, "interrupted": True}
+                SyncService.record(session, user_id, MESSAGE, message.id, chat_id=message.chat_id)
+                repaired += 1
+
+        await session.commit()
+
+    return repaired
+
+
+async def sweep_orphaned_streams():
+    """Run recover_orphaned_streams() every STREAM_ORPHAN_SWEEP_SECONDS
+
+    A worker restarted right after a crash finds its orphans still inside
+    the grace period; a later pass repairs them.
+    """
+    while True:
+        await asyncio.sleep(settings.stream_orphan_sweep_seconds)
+        try:
+            repaired = await recover_orphaned_streams()
+            if repaired:
+                print(f"Recovered {repaired} interrupted streaming message(s)")
+        except Exception as e:
+            print(f"Error recovering orphaned streams: {str(e)}")
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, event, insert, select, delete, func, update
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.change import Change, SyncCounter
+from app.models.chat import Chat as ChatModel
+from app.models.message import Message as MessageModel
+from app.services.conversation import ConversationService
+
+settings = get_settings()
+
+CHAT = "chat"
+MESSAGE = "message"
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+class SyncService:
+    """Change log for incremental client sync"""
+
+    @staticmethod
+    def record(
+        db: AsyncSession,
+        user_id: str,
+        entity: str,
+        entity_id: str,
+        op: str = UPSERT,
+        chat_id: Optional[str] = None
+    ):
+        """Append a change in the caller's transaction"""
+        db.add(Change(
+            user_id=user_id,
+            chat_id=chat_id,
+            entity=entity,
+            entity_id=entity_id,
+            op=op
+        ))
+
+    @staticmethod
+    async def get_changes(db: AsyncSession, user_id: str, since: int, limit: int) -> dict:
+        """Get the current state of everything changed after since
+
+        Multiple changes to one entity collapse to its latest state; deleted
+        entities are returned as tombstone ids.
+        """
+        result = await db.execute(
+            select(Change)
+            .where((Change.user_id == user_id) & (Change.user_seq > since))
+            .order_by(Change.user_seq.asc())
+            .limit(limit + 1)
+        )
+        changes = result.scalars().all()
+
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        cursor = changes[-1].user_seq if changes else since
+
+        # A cursor older than the retained log cannot be served incrementally
+        reset = False
+        if since > 0:
+            pruned = await db.scalar(
+                select(SyncCounter.pruned_seq).where(SyncCounter.user_id == user_id)
+            )
+            reset = since < (pruned or 0)
+
+        latest: dict = {}
+        for change in changes:
+            latest[(change.entity, change.entity_id)] = change.op
+
+        def ids(entity: str, op: str) -> list[str]:
+            return [key[1] for key, value in latest.items() if key[0] == entity and value == op]
+
+        deleted_chats = ids(CHAT, DELETE)
+        chat_ids = ids(CHAT, UPSERT)
+        message_ids = ids(MESSAGE, UPSERT)
+
+        chats = []
+        if chat_ids:
+            result = await db.execute(
+                select(ChatModel).where(
+                    ChatModel.id.in_(chat_ids) & (ChatModel.user_id == user_id)
+                )
+            )
+            chats = result.scalars().all()
+
+        messages = []
+        if message_ids:
+            result = await db.execute(
+                select(MessageModel)
+                .join(ChatModel, ChatModel.id == MessageModel.chat_id)
+                .where(MessageModel.id.in_(message_ids) & (ChatModel.user_id == user_id))
+            )
+            messages = result.scalars().all()
+            await ConversationService.load_children(db, messages)
+
+        return {
+            "cursor": cursor,
+            "has_more": has_more,
+            "reset": reset,
+            "chats": chats,
+            "messages": messages,
+            "deleted_chats": deleted_chats,
+            "deleted_messages": ids(MESSAGE, DELETE),
+        }
+
+
+@event.listens_for(Session, "before_flush")
+def _number_changes(session: Session, flush_context, instances):
+    """Give new changes their user_seq from the users' counter rows
+
+    The counter UPDATE holds the row lock until the transaction ends, so a
+    concurrent writer for the same user waits and takes later numbers:
+    a client's cursor can never pass a change that has not committed yet.
+    """
+    pending: dict[str, list[Change]] = {}
+    for instance in session.new:
+        if isinstance(instance, Change) and instance.user_seq is None:
+            pending.setdefault(instance.user_id, []).append(instance)
+    if not pending:
+        return
+
+    connection = session.connection()
+    # Lock counters in a fixed order so multi-user transactions cannot deadlock
+    for user_id in sorted(pending):
+        changes = pending[user_id]
+        result = connection.execute(
+            update(SyncCounter)
+            .where(SyncCounter.user_id == user_id)
+            .values(seq=SyncCounter.seq + len(changes))
+        )
+        if result.rowcount:
+            last = connection.scalar(select(SyncCounter.seq).where(SyncCounter.user_id == user_id))
+        else:
+            # Users created before counters existed get theirs on first write
+            last = len(changes)
+            connection.execute(
+                insert(SyncCounter).values(user_id=user_id, seq=last, pruned_seq=0)
+            )
+        for offset, change in enumerate(changes):
+            change.user_seq = last - len(changes) + 1 + offset
+
+
+async def prune_changes() -> int:
+    """Drop change log entries older than the retention period
+
+    Each user's pruned_seq is raised to the newest change dropped, so
+    cursors from before it are answered with reset.
+    """
+    if settings.sync_retention_days <= 0:
+        return 0
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.sync_retention_days)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Change.user_id, func.max(Change.user_seq))
+            .where(Change.created_at < cutoff)
+            .group_by(Change.user_id)
+        )
+        watermarks = [
+            {"counter_user_id": user_id, "new_pruned_seq": seq}
+            for user_id, seq in result.all()
+            if seq is not None
+        ]
+        if watermarks:
+            counters = SyncCounter.__table__
+            await session.execute(
+                counters.update()
+                .where(
+                    (counters.c.user_id == bindparam("counter_user_id"))
+                    & (counters.c.pruned_seq < bindparam("new_pruned_seq"))
+                )
+                .values(pruned_seq=bindparam("new_pruned_seq")),
+                watermarks
+            )
+
+        result = await session.execute(delete(Change).where(Change.created_at < cutoff))
+        await session.commit()
+        return result.rowcount or 0
@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Optional
+import asyncio
+import re
+
+from sqlalchemy import update
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.chat import Chat as ChatModel, DEFAULT_CHAT_TITLE
+from app.services.ai import AIService
+from app.services.events import user_events
+from app.services.routing import model_router
+from app.services.sync import SyncService, CHAT
+
+settings = get_settings()
+
+# Characters of each side of the first exchange shown to the title model
+EXCERPT_CHARS = 600
+
+TITLE_PROMPT = (
+    "Write a short title (at most 6 words) for each numbered conversation below, "
+    "in the language of the conversation. Reply with exactly one line per "
+    "conversation in the form '<number>. <title>', and nothing else."
+)
+
+NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*[.):]\s*(.+?)\s*$")
+
+
+@dataclass
+class TitleJob:
+    chat_id: str
+    user_id: str
+    provider: str
+    model: str
+    question: str
+    answer: str
+
+
+def _clean_title(title: str) -> str:
+    """Strip quotes/markdown the model may add and cap the length"""
+    title = title.strip().strip("\"'`*#").strip()
+    title = re.sub(r"^(title|제목)\s*:\s*", "", title, flags=re.IGNORECASE)
+    title = title.rstrip(".。")
+    if len(title) > settings.title_max_chars:
+        title = title[:settings.title_max_chars].rsplit(" ", 1)[0].rstrip() or title[:settings.title_max_chars]
+    return title
+
+
+def _fallback_title(job: TitleJob) -> str:
+    """First line of the user's message, for replies the model skipped"""
+    first_line = next((line for line in job.question.splitlines() if line.strip()), "")
+    return _clean_title(first_line) or DEFAULT_CHAT_TITLE
+
+
+class TitleWorker:
+    """Names new chats in the background after their first reply
+
+    Jobs go into a bounded in-process queue drained by TITLE_WORKERS
+    tasks. Each worker collects up to TITLE_BATCH_SIZE jobs (waiting at
+    most TITLE_BATCH_WINDOW_MS), asks the model for all titles in one
+    completion, writes them in one transaction and notifies the users.
+    A title is only written while the chat still has the default title,
+    so a rename by the user always wins.
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: list[asyncio.Task] = []
+        self.pending: set[str] = set()  # chat ids queued or in progress
+        self.titled = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        if not settings.title_enabled or self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=settings.title_queue_size)
+        self.workers = [
+            asyncio.create_task(self._work()) for _ in range(max(settings.title_workers, 1))
+        ]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queue = None
+        self.pending.clear()
+
+    def submit(self, job: TitleJob) -> bool:
+        """Queue a chat for titling without waiting; False when skipped"""
+        if self.queue is None or job.chat_id in self.pending:
+            return False
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.pending.add(job.chat_id)
+        return True
+
+    async def _next_batch(self) -> list[TitleJob]:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.title_batch_window_ms / 1000
+
+        while len(batch) < settings.title_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _work(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                titles = await self._generate(batch)
+                await self._save(batch, titles)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Error generating chat titles: {str(e)}")
+            finally:
+                for job in batch:
+                    self.pending.discard(job.chat_id)
+
+    async def _generate(self, batch: list[TitleJob]) -> list[str]:
+        """One completion per model in the batch; titles in batch order"""
+        titles: dict[int, str] = {}
+        indexed = sorted(enumerate(batch), key=lambda item: self._model_for(item[1]))
+
+        for model, group in groupby(indexed, key=lambda item: self._model_for(item[1])):
+            group = list(group)
+            conversations = "\n\n".join(
+                f"{number}.\nUser: {job.question[:EXCERPT_CHARS]}\nAssistant: {job.answer[:EXCERPT_CHARS]}"
+                for number, (_, job) in enumerate(group, start=1)
+            )
+            provider, model = model_router.resolve(model)
+            try:
+                reply = await AIService().generate_completion(
+                    [
+                        {"role": "system", "content": TITLE_PROMPT},
+                        {"role": "user", "content": conversations}
+                    ],
+                    model=model,
+                    provider=provider
+                )
+            except Exception as e:
+                print(f"Error generating chat titles with {model}: {str(e)}")
+                continue
+
+            numbered = {
+                int(match.group(1)): match.group(2)
+                for match in map(NUMBERED_LINE.match, reply.splitlines())
+                if match
+            }
+            if len(group) == 1 and not numbered and reply.strip():
+                # A lone title sometimes comes back unnumbered
+                numbered[1] = reply.strip().splitlines()[0]
+            for number, (index, _) in enumerate(group, start=1):
+                if number in numbered:
+                    titles[index] = _clean_title(numbered[number])
+
+        return [titles.get(index) or _fallback_title(job) for index, job in enumerate(batch)]
+
+    @staticmethod
+    def _model_for(job: TitleJob) -> str:
+        return settings.title_model or settings.title_models.get(job.provider) or job.model
+
+    async def _save(self, batch: list[TitleJob], titles: list[str]):
+        """Write titles like update_chat does, skipping chats renamed meanwhile"""
+        saved = []
+        async with AsyncSessionLocal() as session:
+            for job, title in zip(batch, titles):
+                if title == DEFAULT_CHAT_TITLE:
+                    continue
+                result = await session.execute(
+                    update(ChatModel)
+                    .where((ChatModel.id == job.chat_id) & (ChatModel.title == DEFAULT_CHAT_TITLE))
+                    .values(title=title)
+                )
+                if result.rowcount:
+                    SyncService.record(session, job.user_id, CHAT, job.chat_id, chat_id=job.chat_id)
+                    saved.append((job, title))
+            await session.commit()
+
+        self.titled += len(saved)
+        for job, title in saved:
+            user_events.publish(job.user_id, {"chat_title": {"chat_id": job.chat_id, "title": title}})
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.queue is not None,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "pending": len(self.pending),
+            "titled": self.titled,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+
+# Shared instance for this worker process
+title_worker = TitleWorker()
@@ -0,0 +1,187 @@
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+import os
+
+import numpy as np
+
+from app.config import get_settings
+from app.utils.cache import TTLCache
+
+settings = get_settings()
+
+# Open memory maps kept per process (the OS page cache holds the data)
+OPEN_INDEX_CACHE_SIZE = 256
+OPEN_INDEX_CACHE_TTL = 3600
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def _train_ivf(vectors: np.ndarray, nlist: int) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means on a sample; returns (centroids, list of every row)"""
+    rng = np.random.default_rng(0)
+    rows = len(vectors)
+    sample = vectors[np.sort(rng.choice(rows, min(rows, nlist * KMEANS_SAMPLE_PER_LIST), replace=False))]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+    assignment = np.concatenate([
+        np.argmax(vectors[start:start + ASSIGN_BLOCK_ROWS] @ centroids.T, axis=1)
+        for start in range(0, rows, ASSIGN_BLOCK_ROWS)
+    ])
+    return centroids.astype(np.float32), assignment
+
+
+def _save_atomic(path: Path, save):
+    """Write via a temporary file and rename, so readers never see partial data"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".{path.name}.{uuid4()}")
+    try:
+        with open(partial, "wb") as handle:
+            save(handle)
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+class BlobIndex:
+    """Chunk embeddings of one file, memory-mapped
+
+    Small files are searched brute force. Files with at least
+    RETRIEVAL_IVF_MIN_ROWS chunks are stored grouped by IVF list
+    (inverted file: rows clustered around k-means centroids), so a query
+    only scans the RETRIEVAL_IVF_NPROBE closest lists.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        ordinals: Optional[np.ndarray] = None
+    ):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ordinals = ordinals  # stored row -> chunk ordinal (IVF only)
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """(scores, chunk ordinals) of the k best rows, unsorted"""
+        if self.centroids is None:
+            scores = np.asarray(self.vectors @ query)
+            rows = None
+        else:
+            nprobe = min(settings.retrieval_ivf_nprobe, len(self.centroids))
+            probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            spans = [(self.offsets[p], self.offsets[p + 1]) for p in probes]
+            scores = np.concatenate([np.asarray(self.vectors[a:b] @ query) for a, b in spans])
+            rows = np.concatenate([np.arange(a, b) for a, b in spans])
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+
+        if rows is None:
+            return scores[top], top
+        return scores[top], self.ordinals[rows[top]]
+
+
+class VectorStore:
+    """On-disk embedding indexes, one per (embedder, blob sha256)
+
+    Layout: <root>/<embedder>/<sha[:2]>/<sha>.npy (float32 rows, unit
+    length) plus <sha>.ivf.npz for IVF files. Files are written once,
+    atomically, so several workers can share the directory.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._open = TTLCache(OPEN_INDEX_CACHE_SIZE, OPEN_INDEX_CACHE_TTL)
+
+    def _path(self, embedder: str, sha256: str) -> Path:
+        return self.root / embedder / sha256[:2] / f"{sha256}.npy"
+
+    def has(self, embedder: str, sha256: str) -> bool:
+        return self._path(embedder, sha256).exists()
+
+    def write(self, embedder: str, sha256: str, vectors: np.ndarray):
+        """Store a file's chunk embeddings (row i = chunk ordinal i)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        path = self._path(embedder, sha256)
+
+        if len(vectors) >= settings.retrieval_ivf_min_rows:
+            nlist = max(int(np.sqrt(len(vectors))), 1)
+            centroids, assignment = _train_ivf(vectors, nlist)
+            order = np.argsort(assignment, kind="stable")
+            offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+            vectors = vectors[order]
+            # The sidecar goes first: the .npy appearing marks the index complete
+            _save_atomic(
+                path.with_suffix(".ivf.npz"),
+                lambda handle: np.savez(
+                    handle,
+                    centroids=centroids,
+                    offsets=offsets.astype(np.int64),
+                    ordinals=order.astype(np.int32)
+                )
+            )
+
+        _save_atomic(path, lambda handle: np.save(handle, vectors))
+        self._open.pop((embedder, sha256))
+
+    def mark_empty(self, embedder: str, sha256: str):
+        """Store a zero-row index for a blob with nothing to embed, so it is not parsed again"""
+        self.write(embedder, sha256, np.empty((0, 0), dtype=np.float32))
+
+    def load(self, embedder: str, sha256: str) -> Optional[BlobIndex]:
+        key = (embedder, sha256)
+        index = self._open.get(key)
+        if index is not None:
+            return index
+
+        path = self._path(embedder, sha256)
+        if not path.exists():
+            return None
+
+        vectors = np.load(path, mmap_mode="r")
+        ivf_path = path.with_suffix(".ivf.npz")
+        if ivf_path.exists():
+            with np.load(ivf_path) as ivf:
+                index = BlobIndex(vectors, ivf["centroids"], ivf["offsets"], ivf["ordinals"])
+        else:
+            index = BlobIndex(vectors)
+
+        self._open.set(key, index)
+        return index
+
+    def search(
+        self,
+        embedder: str,
+        sha256s: list[str],
+        query: np.ndarray,
+        k: int
+    ) -> list[tuple[float, str, int]]:
+        """Best k (score, sha256, chunk ordinal) across files, best first"""
+        hits = []
+        for sha256 in sha256s:
+            index = self.load(embedder, sha256)
+            if index is None or len(index.vectors) == 0:
+                continue
+            scores, ordinals = index.search(query, k)
+            hits.extend(zip(scores.tolist(), [sha256] * len(scores), ordinals.tolist()))
+
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return hits[:k]
+
+
+vector_store = VectorStore(Path(settings.upload_dir) / "index")
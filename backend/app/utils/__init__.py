@@ -1,13 +1,30 @@
+from app.utils.cache import TTLCache
+from app.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
 from app.utils.security import (
     verify_password,
     get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
-    decode_access_token
+    decode_access_token,
+    PasswordHasher,
+    PasswordHasherBusy,
+    password_hasher
 )
 
 __all__ = [
+    "TTLCache",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
     "verify_password",
     "get_password_hash",
+    "verify_password_async",
+    "get_password_hash_async",
     "create_access_token",
-    "decode_access_token"
+    "decode_access_token",
+    "PasswordHasher",
+    "PasswordHasherBusy",
+    "password_hasher"
 ]
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Any, Optional
+import base64
+import json
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, tuple_
+
+from app.config import get_settings
+
+settings = get_settings()
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_limit(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Rows per page, or None (the whole list) when neither limit nor cursor is sent
+
+    Clients that do not paginate keep getting complete listings.
+    """
+    if limit is None and cursor:
+        return settings.page_size_default
+    return limit
+
+
+def encode_cursor(row_id: str, sort_value: Optional[datetime]) -> str:
+    """Encode the last row of a page as an opaque cursor"""
+    payload = [row_id, sort_value.isoformat() if sort_value else None]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, Optional[datetime]]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        row_id, sort_value = json.loads(base64.urlsafe_b64decode(padded))
+        return str(row_id), datetime.fromisoformat(sort_value) if sort_value else None
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_after(model, sort_column, cursor: str, scope, descending: bool = False) -> Any:
+    """Build the WHERE clause for rows after cursor in (sort_column, id) order
+
+    A single row-value comparison, so the (..., sort_column, id) index
+    serves it. The anchor's sort value is read from the database by id,
+    within scope (the listing's own filter), so comparisons use the stored
+    representation exactly. The value embedded in the cursor is only a
+    fallback, used when the anchor row is gone or outside scope: a row
+    id from another chat or user cannot move the position.
+    """
+    row_id, sort_value = decode_cursor(cursor)
+    anchor = func.coalesce(
+        select(sort_column).where((model.id == row_id) & scope).scalar_subquery(),
+        sort_value
+    )
+
+    key = tuple_(sort_column, model.id)
+    position = tuple_(anchor, row_id)
+    return key < position if descending else key > position
@@ -1,6 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
+import asyncio
 import hashlib
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import get_settings
@@ -32,6 +35,97 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(prehashed)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+class PasswordHasher:
+    """Run bcrypt off the event loop on a small dedicated thread pool
+
+    bcrypt releases the GIL, so a few threads keep hashing parallel without
+    stalling streams on the loop. Calls beyond max_pending (running plus
+    queued) are rejected immediately instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_seconds = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def run(self, func: Callable, *args):
+        """Run func(*args) in the pool, rejecting when saturated"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        self.pending += 1
+        submitted = time.perf_counter()
+        started = submitted
+
+        def timed():
+            nonlocal started
+            started = time.perf_counter()
+            return func(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+        finally:
+            finished = time.perf_counter()
+            self.pending -= 1
+            self.calls += 1
+            self.wait_seconds += started - submitted
+            self.run_seconds += finished - started
+            self.max_seconds = max(self.max_seconds, finished - submitted)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+            "avg_run_ms": round(self.run_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await password_hasher.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -0,0 +1,143 @@
+"""Local stand-ins for the AI providers, for load testing without API costs
+
+Serves the OpenAI-compatible streaming endpoint (/v1/chat/completions,
+SSE) and Ollama's /api/chat (NDJSON) with a configurable time to first
+token, token rate, reply length and error rate.
+
+    python -m benchmarks.fake_providers --port 9100 --ttft-ms 300 --tokens-per-second 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeProviderConfig:
+    """Timing and failure behaviour of the fake providers"""
+
+    def __init__(
+        self,
+        ttft_ms: float = 200.0,
+        tokens_per_second: float = 50.0,
+        tokens: int = 64,
+        error_rate: float = 0.0,
+        jitter: float = 0.1
+    ):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.jitter = jitter
+
+    def delay(self, seconds: float) -> float:
+        """Apply +/- jitter to a delay"""
+        return max(0.0, seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+def create_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI(title="Fake AI providers")
+
+    async def tokens():
+        await asyncio.sleep(config.delay(config.ttft_ms / 1000))
+        interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        for i in range(config.tokens):
+            if i:
+                await asyncio.sleep(config.delay(interval))
+            yield f"tok{i} "
+
+    def failed() -> bool:
+        return random.random() < config.error_rate
+
+    @app.get("/api/tags")
+    async def ollama_tags():
+        return {"models": []}
+
+    @app.post("/api/chat")
+    async def ollama_chat(request: Request):
+        body = await request.json()
+        if failed():
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+
+        async def stream():
+            async for token in tokens():
+                yield json.dumps({
+                    "model": body.get("model"),
+                    "message": {"role": "assistant", "content": token},
+                    "done": False
+                }) + "\n"
+            yield json.dumps({
+                "model": body.get("model"),
+                "message": {"role": "assistant", "content": ""},
+                "done": True
+            }) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/v1/models")
+    async def openai_models():
+        return {"object": "list", "data": []}
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        if failed():
+            return JSONResponse(
+                {"error": {"message": "injected failure", "type": "server_error"}},
+                status_code=500
+            )
+
+        completion_id = f"chatcmpl-{uuid4().hex}"
+        created = int(time.time())
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            async for token in tokens():
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeProviderConfig(
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        jitter=args.jitter
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
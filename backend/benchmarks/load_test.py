@@ -0,0 +1,373 @@
+"""End-to-end load test of /messages/generate against fake providers
+
+Starts the fake providers and the real FastAPI app (uvicorn, temporary
+SQLite database) as subprocesses, drives generations at a fixed
+concurrency and reports throughput, TTFT, inter-token latency and error
+rate as JSON. With --baseline the run is compared against an earlier
+report and exits non-zero on regressions.
+
+    python -m benchmarks.load_test --concurrency 32 --requests 500 --output run.json
+    python -m benchmarks.load_test --provider openai --baseline run.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+API_PREFIX = "/api/v1"
+
+# Summary metric -> whether a higher value is worse
+REGRESSION_KEYS = {
+    "throughput_rps": False,
+    "tokens_per_second": False,
+    "error_rate": True,
+    "ttft_ms.p50": True,
+    "ttft_ms.p99": True,
+    "inter_token_ms.p50": True,
+    "inter_token_ms.p99": True,
+    "latency_ms.p50": True,
+    "latency_ms.p99": True,
+}
+
+
+def percentiles(values: list[float]) -> dict:
+    """Nearest-rank percentiles (and mean) of values"""
+    if not values:
+        return {"mean": None, "p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 3)
+
+    return {
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class Result:
+    """Timing of one generation request as seen by the client"""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.ok = False
+        self.error: Optional[str] = None
+        self.ttft: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.gaps: list[float] = []
+        self.tokens = 0
+
+
+@contextmanager
+def run_process(args: list[str], env: dict):
+    # stderr goes to a file so a chatty process can never block on a full pipe
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(
+            [sys.executable, *args],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=log
+        )
+        process.log = log
+        try:
+            yield process
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def wait_ready(url: str, process: Optional[subprocess.Popen] = None, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                process.log.seek(0)
+                raise RuntimeError(f"{url} exited early:\n{process.log.read().decode()}")
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+async def create_users(client: httpx.AsyncClient, count: int) -> list[tuple[dict, str]]:
+    """Register users and give each a chat; returns (headers, chat_id) pairs"""
+    run_id = os.urandom(4).hex()
+
+    async def create(i: int):
+        username = f"bench_{run_id}_{i}"
+        password = "bench-password"
+        response = await client.post(f"{API_PREFIX}/auth/register", json={
+            "email": f"{username}@example.com",
+            "username": username,
+            "password": password
+        })
+        response.raise_for_status()
+        response = await client.post(
+            f"{API_PREFIX}/auth/login",
+            data={"username": username, "password": password}
+        )
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await client.post(
+            f"{API_PREFIX}/chats", json={"title": "benchmark"}, headers=headers
+        )
+        response.raise_for_status()
+        return headers, response.json()["id"]
+
+    return list(await asyncio.gather(*(create(i) for i in range(count))))
+
+
+async def generate(client: httpx.AsyncClient, headers: dict, chat_id: str, model: str, n: int) -> Result:
+    """Run one generation and time its SSE events"""
+    result = Result()
+    started = time.perf_counter()
+    last_token_at = None
+
+    try:
+        async with client.stream(
+            "POST",
+            f"{API_PREFIX}/messages/generate",
+            json={"chat_id": chat_id, "content": f"benchmark request {n}", "role": "user", "model": model},
+            headers=headers
+        ) as response:
+            result.status = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                result.error = f"HTTP {response.status_code}"
+                return result
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                now = time.perf_counter()
+
+                if "chunk" in event:
+                    if last_token_at is None:
+                        result.ttft = now - started
+                    else:
+                        result.gaps.append(now - last_token_at)
+                    last_token_at = now
+                    result.tokens += 1
+                elif "error" in event:
+                    result.error = str(event["error"])
+                elif event.get("done"):
+                    result.ok = True
+    except httpx.HTTPError as e:
+        result.error = f"{e.__class__.__name__}: {e}"
+    finally:
+        result.latency = time.perf_counter() - started
+
+    if not result.ok and result.error is None:
+        result.error = "stream ended without done event"
+    return result
+
+
+async def drive(base_url: str, args) -> dict:
+    """Create users, then run args.requests generations at args.concurrency"""
+    limits = httpx.Limits(max_connections=args.concurrency + 8)
+    timeout = httpx.Timeout(args.request_timeout)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        users = await create_users(client, args.users or args.concurrency)
+
+        results: list[Result] = []
+        counter = iter(range(args.requests))
+        deadline = time.perf_counter() + args.duration if args.duration else None
+
+        async def worker(index: int):
+            headers, chat_id = users[index % len(users)]
+            for n in counter:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                results.append(await generate(client, headers, chat_id, args.model, n))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        metrics_text = None
+        try:
+            response = await client.get("/metrics")
+            if response.status_code == 200:
+                metrics_text = response.text
+        except httpx.HTTPError:
+            pass
+
+    return summarize(results, elapsed, args, metrics_text)
+
+
+def summarize(results: list[Result], elapsed: float, args, metrics_text: Optional[str]) -> dict:
+    succeeded = [r for r in results if r.ok]
+    errors: dict = {}
+    for r in results:
+        if not r.ok:
+            errors[r.error] = errors.get(r.error, 0) + 1
+
+    tokens = sum(r.tokens for r in succeeded)
+    report = {
+        "config": {
+            "provider": args.provider,
+            "model": args.model,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "fake_ttft_ms": args.ttft_ms,
+            "fake_tokens_per_second": args.tokens_per_second,
+            "fake_tokens": args.tokens,
+            "fake_error_rate": args.error_rate,
+        },
+        "summary": {
+            "requests": len(results),
+            "succeeded": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "error_rate": round((len(results) - len(succeeded)) / len(results), 4) if results else 0.0,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(succeeded) / elapsed, 3) if elapsed else 0.0,
+            "tokens_per_second": round(tokens / elapsed, 3) if elapsed else 0.0,
+            "ttft_ms": percentiles([r.ttft * 1000 for r in succeeded if r.ttft is not None]),
+            "inter_token_ms": percentiles([gap * 1000 for r in succeeded for gap in r.gaps]),
+            "latency_ms": percentiles([r.latency * 1000 for r in succeeded]),
+        },
+        "errors": errors,
+    }
+    if args.include_metrics and metrics_text is not None:
+        report["server_metrics"] = metrics_text
+    return report
+
+
+def lookup(summary: dict, key: str):
+    value = summary
+    for part in key.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """List summary metrics that got worse than baseline by more than tolerance"""
+    regressions = []
+    for key, higher_is_worse in REGRESSION_KEYS.items():
+        current = lookup(report["summary"], key)
+        previous = lookup(baseline["summary"], key)
+        if current is None or previous is None:
+            continue
+
+        if key == "error_rate":
+            worse = current > previous + tolerance
+        elif higher_is_worse:
+            worse = current > previous * (1 + tolerance)
+        else:
+            worse = current < previous * (1 - tolerance)
+
+        if worse:
+            regressions.append({"metric": key, "baseline": previous, "current": current})
+    return regressions
+
+
+async def run(args) -> dict:
+    env = dict(os.environ)
+
+    if args.app_url:
+        await wait_ready(f"{args.app_url}/health")
+        return await drive(args.app_url, args)
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env.update({
+            "DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/bench.db",
+            "DEBUG": "False",
+            "DEFAULT_AI_PROVIDER": args.provider,
+            "OLLAMA_BASE_URL": fake_url,
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"{fake_url}/v1",
+            "COMPLETION_CACHE_ENABLED": "False",
+            "PROVIDER_WARMUP": "False",
+        })
+        for item in args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+
+        fake_args = [
+            "-m", "benchmarks.fake_providers",
+            "--port", str(args.fake_port),
+            "--ttft-ms", str(args.ttft_ms),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--tokens", str(args.tokens),
+            "--error-rate", str(args.error_rate),
+        ]
+        app_args = [
+            "-m", "uvicorn", "app.main:app",
+            "--port", str(args.app_port),
+            "--log-level", "warning",
+            "--no-access-log",
+        ]
+
+        with run_process(fake_args, env) as fake, run_process(app_args, env) as server:
+            await wait_ready(f"{fake_url}/api/tags", fake)
+            await wait_ready(f"{app_url}/health", server)
+            return await drive(app_url, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["ollama", "openai"], default="ollama")
+    parser.add_argument("--model", default=None, help="default: llama2 / gpt-3.5-turbo")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=None, help="stop after N seconds")
+    parser.add_argument("--users", type=int, default=None, help="default: one per worker")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--app-port", type=int, default=9000)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--app-url", default=None, help="drive an already running app instead")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the app")
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    parser.add_argument("--include-metrics", action="store_true", help="embed /metrics output")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+    args.model = args.model or ("gpt-3.5-turbo" if args.provider == "openai" else "llama2")
+
+    report = asyncio.run(run(args))
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        report["regressions"] = compare(report, baseline, args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()